@@ -1,7 +1,7 @@
 import threading
 import asyncio
 # from flask import Flask # No longer needed directly here
-from utils.api_handler import app # Import the Flask app instance
+from utils.api_handler import asgi_app # ASGI front end wrapping the Flask app
 from hypercorn.config import Config
 from hypercorn.asyncio import serve
 # from hypercorn.middleware import AsyncioWSGIMiddleware # No longer needed
@@ -14,8 +14,10 @@ async def main():
     print("Starting IPD-Lingual ASGI server with Hypercorn...")
     config = Config()
     config.bind = ["0.0.0.0:10000"] # Bind to the same port as before
-    # Serve the Flask app directly (Flask >= 2.0 supports ASGI)
-    await serve(app, config)
+    # Serve the ASGI router: async views (detect, speech, phrase) run on this event
+    # loop, other routes are passed to Flask. Lifespan events open/close the
+    # pooled upstream session.
+    await serve(asgi_app, config)
 
 if __name__ == "__main__":
     # Run the asyncio event loop with the main async function
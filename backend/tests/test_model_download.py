@@ -0,0 +1,118 @@
+"""
+Model downloader (utils/model_manager.fetch_file) against a local HTTP stand-in.
+
+Run from backend/:  python -m pytest -q tests
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import model_manager  # noqa: E402
+
+PAYLOAD = os.urandom(10 * 1024 + 123)
+SEGMENT_SIZE = 1024
+
+
+class FileHandler(BaseHTTPRequestHandler):
+    """Serves PAYLOAD with Range support; HEAD can be turned off to mimic picky hosts."""
+
+    allow_head = True
+    ranges = []  # Range headers received, in order
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        if not self.allow_head:
+            self.send_error(405)
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(PAYLOAD)))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+
+    def do_GET(self):
+        match = re.fullmatch(r"bytes=(\d+)-(\d+)", self.headers.get("Range", ""))
+        if not match:
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(PAYLOAD)))
+            self.end_headers()
+            self.wfile.write(PAYLOAD)
+            return
+        start, end = int(match.group(1)), min(int(match.group(2)), len(PAYLOAD) - 1)
+        type(self).ranges.append((start, end))
+        self.send_response(206)
+        self.send_header("Content-Range", f"bytes {start}-{end}/{len(PAYLOAD)}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        self.wfile.write(PAYLOAD[start:end + 1])
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(model_manager, "DOWNLOAD_SEGMENT_SIZE", SEGMENT_SIZE)
+    FileHandler.allow_head = True
+    FileHandler.ranges = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), FileHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/model.onnx"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _segments(size):
+    return [(start, min(start + SEGMENT_SIZE, size) - 1) for start in range(0, size, SEGMENT_SIZE)]
+
+
+@pytest.mark.parametrize("allow_head", [True, False])
+def test_ranged_download_is_verified_and_renamed(server, tmp_path, allow_head):
+    FileHandler.allow_head = allow_head
+    dest = str(tmp_path / "model.onnx")
+
+    model_manager.fetch_file(server, dest, sha256=hashlib.sha256(PAYLOAD).hexdigest(), workers=3)
+
+    with open(dest, "rb") as f:
+        assert f.read() == PAYLOAD
+    assert sorted(set(FileHandler.ranges) - {(0, 0)}) == _segments(len(PAYLOAD))
+    assert os.listdir(tmp_path) == ["model.onnx"]  # No .part or .state left behind
+
+
+def test_interrupted_download_resumes_missing_segments(server, tmp_path):
+    dest = str(tmp_path / "model.onnx")
+    part_path = dest + ".part"
+    segments = _segments(len(PAYLOAD))
+    done = [0, 2, 3]
+    with open(part_path, "wb") as f:
+        f.truncate(len(PAYLOAD))
+        for index in done:
+            start, end = segments[index]
+            f.seek(start)
+            f.write(PAYLOAD[start:end + 1])
+    with open(part_path + ".state", "w", encoding="utf-8") as f:
+        json.dump({"url": server, "size": len(PAYLOAD), "done": done}, f)
+
+    model_manager.fetch_file(server, dest, sha256=hashlib.sha256(PAYLOAD).hexdigest(), workers=2)
+
+    with open(dest, "rb") as f:
+        assert f.read() == PAYLOAD
+    assert sorted(FileHandler.ranges) == [segments[i] for i in range(len(segments)) if i not in done]
+
+
+def test_checksum_mismatch_keeps_destination_untouched(server, tmp_path):
+    dest = tmp_path / "model.onnx"
+    dest.write_bytes(b"previous model")
+
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        model_manager.fetch_file(server, str(dest), sha256="0" * 64)
+
+    assert dest.read_bytes() == b"previous model"
+    assert os.listdir(tmp_path) == ["model.onnx"]
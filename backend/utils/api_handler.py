@@ -8,10 +8,11 @@ Features:
 - MongoDB integration
 """
 
-from flask import Flask, jsonify, session, request, redirect, url_for, render_template
+from flask import Flask, jsonify, session, request, redirect, url_for, render_template, g
 from pymongo import MongoClient
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, get_jwt
 from flask_cors import CORS
+from werkzeug.exceptions import HTTPException
 from decouple import config
 import datetime
 import hashlib
@@ -23,8 +24,20 @@ import base64
 import json
 import os
 from utils.detection_service import DetectionService
-from utils.speech_service import handle_speech_api_request
-from googletrans import Translator
+from utils.image_utils import upload_digest
+from utils.speech_service import handle_streamed_speech_request, read_speech_upload, stream_segmented_speech
+from utils.speech_service import speech_result_cache
+from utils.speech_jobs import speech_jobs, JobQueueFull, SPEECH_JOB_MAX_WAIT
+from utils.speech_upload import SPEECH_MAX_AUDIO_BYTES, SpeechUploadError
+from utils.http_client import upstream
+from utils.asgi import AsyncRouter, request_body_stream, stream_response
+from utils.tracing import TRACE_SERVER_TIMING, span, start_trace, end_trace, log_trace
+from utils.tracing import logger as timing_logger
+from utils.translator_service import translator_service, TranslatorUnavailable
+from utils.content_store import content_store, GUIDEBOOK_LANGUAGES
+from utils.content_search import content_search
+from utils.static_responses import STATIC_CONTENT_MAX_AGE, prepared_body, send_prepared
+from utils import static_responses
 from bson import ObjectId
 from groq import Groq # Added Groq import
 from datetime import date, timedelta # Added date and timedelta
@@ -70,64 +83,46 @@ async def _run_detection(file, profile, target_language, username):
     """
     Helper async function for object detection with translation
     """
-    image_bytes = await asyncio.to_thread(file.read)
-    nparr = np.frombuffer(image_bytes, np.uint8)
-    frame = await asyncio.to_thread(cv2.imdecode, nparr, cv2.IMREAD_COLOR)
-    if frame is None:
-        raise ValueError("Could not decode image")
+    with span("read"):
+        image_bytes = await asyncio.to_thread(file.read)
+    # Uploads seen before are answered from the detection cache without decoding them
+    content_hash = upload_digest(image_bytes)
+    cached = detection_service.cached_detection(content_hash, profile)
+    prepared = None
+    if cached is None:
+        # JPEGs the detector accepts are forwarded as-is; anything else is decoded here
+        # (raises ValueError if the upload is not a readable image)
+        with span("decode"):
+            prepared = await asyncio.to_thread(detection_service.prepare_image, image_bytes, content_hash)
     # Pass target_language and username to the service
     return await detection_service.detect_objects_api(
-        frame,
+        prepared,
         profile=profile,
         target_language=target_language,
-        username=username
+        username=username,
+        cached=cached
     )
 
-async def _run_speech(file, audio_format, lang1, lang2):
-    """
-    Helper async function for speech processing
-    """
-    audio_binary = await asyncio.to_thread(file.read)
-    return await handle_speech_api_request(audio_binary, audio_format, lang1, lang2)
-
 def get_todays_challenge_word():
-    """Helper function to get today's challenge word."""
-    challenge_file_path = os.path.join('utils', 'quiz', 'daily_challenges.json')
-    if not os.path.exists(challenge_file_path):
+    """Helper function to get today's challenge word (served from the content store)."""
+    challenges = content_store.daily_challenges()
+    if challenges is None:
         print("Error: Daily challenge data file not found.")
         return None
-    try:
-        with open(challenge_file_path, 'r', encoding='utf-8') as f:
-            all_challenges = json.load(f)
-        if not all_challenges:
-            print("Error: No challenges found in the file.")
-            return None
-
-        today = date.today()
-        day_of_month = today.day # Use day of the month
-
-        # Find the challenge for the current day of the month
-        # Assumes structure like [{"day": 1, "challenge": "word"}, ...]
-        todays_challenge = next((item['challenge'] for item in all_challenges if item.get('day') == day_of_month), None)
-
-        if not todays_challenge:
-            print(f"Warning: No challenge found for day {day_of_month}. Using fallback.")
-            # Fallback: use day of year modulo length if day of month fails
-            day_of_year = today.timetuple().tm_yday
-            if not all_challenges: # Avoid division by zero if file is empty after checks
-                 return None
-            challenge_index = (day_of_year - 1) % len(all_challenges)
-            # Assuming the structure is {"day": N, "challenge": "word"}
-            # Need to access the 'challenge' key from the selected object
-            selected_challenge_obj = all_challenges[challenge_index]
-            todays_challenge = selected_challenge_obj.get('challenge') if selected_challenge_obj else None
-
-
-        return todays_challenge.lower() if todays_challenge else None # Return lowercase word or None
-
-    except Exception as e:
-        print(f"Error reading or processing daily challenge file: {e}")
+    if not challenges.items:
+        print("Error: No challenges found in the file.")
         return None
+    # Challenge for the current day of the month, cycling by day of year as a fallback
+    return challenges.word_for(date.today())
+
+def canonical_label(label):
+    """Lowercase alphanumerics only: 'Cell-Phone', 'cell phone' and 'cellphone' compare equal."""
+    return "".join(ch for ch in (label or "").lower() if ch.isalnum())
+
+def challenge_word_detected(challenge_word, labels):
+    """True if one of the detected labels is the challenge word, ignoring case, spaces and punctuation."""
+    target = canonical_label(challenge_word)
+    return bool(target) and any(canonical_label(label) == target for label in labels)
 # =============================================================================
 # App Initialization
 # =============================================================================
@@ -135,6 +130,14 @@ def get_todays_challenge_word():
 app = Flask(__name__)
 CORS(app)
 
+# ASGI entry point served by Hypercorn (see run_server.py). Views registered with
+# @asgi_app.route run natively on the server event loop; everything else goes to Flask.
+asgi_app = AsyncRouter(app)
+asgi_app.on_startup.append(upstream.startup)
+asgi_app.on_shutdown.append(upstream.shutdown)
+asgi_app.on_startup.append(speech_jobs.start)
+asgi_app.on_shutdown.insert(0, speech_jobs.stop) # Stop the workers before the upstream session closes
+
 # =============================================================================
 # Request Logging Middleware
 # =============================================================================
@@ -148,6 +151,17 @@ log_handler.setFormatter(logging.Formatter(
 # Only add the handler if Flask isn't already logging to stdout/stderr by default
 if not app.logger.handlers:
      app.logger.addHandler(log_handler)
+# Per-stage timings are logged as one JSON line per sampled request
+timing_logger.setLevel(logging.INFO)
+if not timing_logger.handlers:
+     timing_logger.addHandler(log_handler)
+
+@app.before_request
+def start_request_timing():
+    """Start a stage-timing trace for this request (sampled, see utils/tracing.py)."""
+    # Health checks are polled constantly and have no stages worth timing
+    sample_rate = 0 if request.path == '/health' else None
+    g.trace, g.trace_token = start_trace(f"{request.method} {request.path}", sample_rate)
 
 @app.after_request
 def log_request_info(response):
@@ -156,12 +170,28 @@ def log_request_info(response):
     app.logger.info(
         f'{request.remote_addr} - "{request.method} {request.path} HTTP/{request.environ.get("SERVER_PROTOCOL", "1.1")}" {response.status_code}'
     )
+    # Report stage timings for sampled requests
+    trace = g.get('trace')
+    if trace is not None:
+        if TRACE_SERVER_TIMING:
+            response.headers['Server-Timing'] = trace.server_timing()
+        log_trace(trace, status=response.status_code)
     # Log request headers (optional, can be verbose)
     # app.logger.debug(f"Request Headers: {request.headers}")
     # Log response headers (optional, can be verbose)
     # app.logger.debug(f"Response Headers: {response.headers}")
     return response
 
+@app.teardown_request
+def end_request_timing(exc):
+    """Detach the request's trace from the current context."""
+    token = g.pop('trace_token', None)
+    if token is not None:
+        try:
+            end_trace(token)
+        except ValueError:
+            pass  # Set in a different context (e.g. a copied one); nothing to reset here
+
 
 
 # JWT Configuration
@@ -178,6 +208,7 @@ blacklist_collection = db['token_blacklist']
 
 # Services initialization
 detection_service = DetectionService()
+asgi_app.on_startup.append(detection_service.warmup) # Warms the translation cache; loads the local detector when DETECTION_BACKEND=local
 model = None
 model_active = False
 
@@ -195,9 +226,14 @@ RESET_OTP_EXPIRY_MINUTES = 10
 def health_check():
     """
     Health check endpoint.
-    Returns a simple JSON response indicating the service is up.
+    Returns a simple JSON response indicating the service is up,
+    plus hit/miss counters for the in-process caches.
     """
-    return jsonify({"status": "ok"}), 200
+    caches = detection_service.get_cache_stats()
+    caches["speech"] = speech_result_cache.stats()
+    caches["static_responses"] = static_responses.stats()
+    return jsonify({"status": "ok", "caches": caches, "speech_jobs": speech_jobs.stats(),
+                    "content": content_store.stats()}), 200
 
 @app.route('/', methods=['GET'])
 def root_health_check():
@@ -531,12 +567,21 @@ def delete_detection(detection_id): # Added detection_id parameter
 # Quiz Management Endpoints
 # =============================================================================
 
+QUIZ_PAGE_SIZE = 10
+QUIZ_MAX_PAGE_SIZE = 50
+
 @app.route("/api/quiz", methods=["GET"])
 @jwt_required()
 def get_quiz():
     """
     Get quiz questions for user's current level and targegt language
-    Returns: Quiz questions or error
+    Query params (all optional):
+        level - only questions of this CEFR level (e.g. A2)
+        type - only questions of this type (e.g. grammar)
+        cursor - question position to continue from (next_cursor of the previous page);
+                 defaults to the user's quiz_index
+        limit - page size, 1-50 (default 10)
+    Returns: Quiz questions, total matching count and next_cursor (null on the last page) or error
     """
     current_user = get_jwt_identity()
     user = users_collection.find_one({"username": current_user})
@@ -548,34 +593,57 @@ def get_quiz():
     target_language_code = user.get('target_language', 'en')
     language_name = get_language_name_from_code(target_language_code)
 
-    quiz_file_path = os.path.join('utils', 'quiz', f'{language_name}_quiz_dataset.json')  # Assumes files like english_quiz_dataset.json
-
-    if not os.path.exists(quiz_file_path):
-        quiz_file_path_alt = os.path.join('utils', 'quiz', f'{language_name}_quiz.json')
-        if not os.path.exists(quiz_file_path_alt):
-            return jsonify({"msg": f"Quiz file not found for language: {language_name}"}), 404
-        quiz_file_path = quiz_file_path_alt  # Use the fallback path
-
+    level = request.args.get('level') or None
+    question_type = request.args.get('type') or None
     try:
-        with open(quiz_file_path, 'r', encoding='utf-8') as f:
-            all_questions = json.load(f)
-    except Exception as e:
-        print(f"Error reading quiz file {quiz_file_path}: {e}")
-        return jsonify({"msg": "Error reading quiz file"}), 500
+        cursor = int(request.args.get('cursor', quiz_index))
+        limit = int(request.args.get('limit', QUIZ_PAGE_SIZE))
+        if cursor < 0 or not 1 <= limit <= QUIZ_MAX_PAGE_SIZE:
+            raise ValueError
+    except ValueError:
+        return jsonify({"msg": f"'cursor' must be a non-negative integer and 'limit' between 1 and {QUIZ_MAX_PAGE_SIZE}"}), 400
+
+    # Loaded and indexed once from utils/quiz/<language>_quiz_dataset.json (or <language>_quiz.json)
+    quiz = content_store.quiz(language_name)
+    if quiz is None:
+        return jsonify({"msg": f"Quiz file not found for language: {language_name}"}), 404
+
+    def build_quiz_page():
+        # Posting lists make this O(page) whatever the filters
+        questions_to_serve, next_cursor = quiz.page(cursor, limit, level, question_type)
+        return {
+            "current_level": cursor,  # Send the starting index as current level
+            "questions": questions_to_serve,
+            "total": quiz.count(level, question_type),
+            "next_cursor": next_cursor
+        }
+
+    # Each distinct page is serialized and compressed once
+    page_key = ("quiz", language_name, level, question_type, cursor, limit)
+    return send_prepared(prepared_body(page_key, quiz, build_quiz_page))
+
+@app.route("/api/quiz/summary", methods=["GET"])
+@jwt_required()
+def get_quiz_summary():
+    """
+    Question counts for the user's target language, overall and per level and type
+    Returns: language, total, levels, types
+    """
+    current_user = get_jwt_identity()
+    user = users_collection.find_one({"username": current_user}, {"target_language": 1})
+    if not user:
+        return jsonify({"msg": "User not found"}), 404
 
-    total_questions = len(all_questions)
-    start_index = quiz_index
-    end_index = min(start_index + 10, total_questions)  # Get next 10 or fewer if at the end
+    language_name = get_language_name_from_code(user.get('target_language', 'en'))
+    quiz = content_store.quiz(language_name)
+    if quiz is None:
+        return jsonify({"msg": f"Quiz file not found for language: {language_name}"}), 404
 
-    if start_index >= total_questions:
-        questions_to_serve = []  # Or return a message indicating completion
-    else:
-        questions_to_serve = all_questions[start_index:end_index]
-
-    return jsonify({
-        "current_level": quiz_index,  # Send the starting index as current level
-        "questions": questions_to_serve
-    }), 200
+    return send_prepared(prepared_body(("quiz_summary", language_name), quiz, lambda: {
+        "language": language_name,
+        "total": len(quiz),
+        **quiz.facets()
+    }))
 
 @app.route("/api/complete_quiz", methods=["GET"])
 @jwt_required()
@@ -702,15 +770,7 @@ def homepage_summary():
         'fr': 'french', 'es': 'spanish', 'zh': 'chinese', 'ja': 'japanese', 'ru': 'russian'
     }
     language_name = language_map.get(target_language, 'english')
-    quiz_file_path = os.path.join('utils', 'quiz', f'{language_name}_quiz_dataset.json')
-    if not os.path.exists(quiz_file_path):
-        quiz_file_path = os.path.join('utils', 'quiz', f'{language_name}_quiz.json')
-    try:
-        with open(quiz_file_path, 'r', encoding='utf-8') as f:
-            all_questions = json.load(f)
-            total_quiz_questions = len(all_questions)
-    except Exception:
-        total_quiz_questions = 0
+    total_quiz_questions = content_store.quiz_length(language_name)
     # Daily challenge status
     from datetime import date
     today = date.today()
@@ -746,9 +806,8 @@ def homepage_summary():
 # AI Detection and Speech Processing Endpoints
 # =============================================================================
 
-@app.route("/api/detect", methods=["POST"])
-@jwt_required()
-def api_detect():
+@asgi_app.route("/api/detect", methods=["POST"], jwt_required=True)
+async def api_detect():
     """
     Detect objects in an image with optional translation and daily challenge check.
     Form data: image, profile, confidence, iou, target_language
@@ -763,11 +822,13 @@ def api_detect():
 
     current_user = get_jwt_identity()
 
-    # Fetch user data once, including challenge fields
-    user_data = users_collection.find_one(
-        {"username": current_user},
-        {"target_language": 1, "daily_challenge_streak": 1, "last_challenge_completed_at": 1}
-    )
+    # Fetch user data once, including challenge fields (pymongo blocks, keep it off the event loop)
+    with span("db_user"):
+        user_data = await asyncio.to_thread(
+            users_collection.find_one,
+            {"username": current_user},
+            {"target_language": 1, "daily_challenge_streak": 1, "last_challenge_completed_at": 1}
+        )
     if not user_data:
          # Should not happen if JWT is valid, but good practice to check
          return jsonify({"status": "error", "message": "User not found"}), 404
@@ -787,7 +848,8 @@ def api_detect():
 
     # --- Daily Challenge Logic Prep ---
     challenge_completed_today = False
-    todays_challenge_word = get_todays_challenge_word()
+    with span("challenge_word"):
+        todays_challenge_word = await asyncio.to_thread(get_todays_challenge_word)
     last_completed_dt = user_data.get('last_challenge_completed_at') # Get from fetched user_data
     current_streak = user_data.get('daily_challenge_streak', 0) # Get from fetched user_data
     update_user_challenge_in_db = False # Flag to update DB later
@@ -801,7 +863,7 @@ def api_detect():
         # Run detection - Assuming _run_detection returns a dict like:
         # {'detections': [{'label': '...', 'label_en': 'original_label', ...}], 'image_base64': '...'}
         # The 'label_en' key is crucial here.
-        results = asyncio.run(_run_detection(file, profile, final_target_language, current_user))
+        results = await _run_detection(file, profile, final_target_language, current_user)
 
         # --- Daily Challenge Check Post-Detection ---
         if todays_challenge_word and not challenge_completed_today: # Only check if word exists and not already completed today
@@ -816,7 +878,8 @@ def api_detect():
                      for det in results['objects'] if isinstance(det.get('label_en'), str)
                  ]
 
-            if todays_challenge_word in detected_labels_en:
+            # Spelling variants ("cellphone" / "cell phone") count as the challenge word
+            if challenge_word_detected(todays_challenge_word, detected_labels_en):
                 # Challenge word detected! Update streak and timestamp.
                 challenge_completed_today = True # Mark as completed now
                 update_user_challenge_in_db = True # Set flag to update DB
@@ -842,13 +905,15 @@ def api_detect():
 
         # Update user in DB if challenge was completed in *this* request
         if update_user_challenge_in_db:
-            users_collection.update_one(
-                {"username": current_user},
-                {"$set": {
-                    "daily_challenge_streak": current_streak,
-                    "last_challenge_completed_at": last_completed_dt # Store the new datetime object
-                }}
-            )
+            with span("db_update"):
+                await asyncio.to_thread(
+                    users_collection.update_one,
+                    {"username": current_user},
+                    {"$set": {
+                        "daily_challenge_streak": current_streak,
+                        "last_challenge_completed_at": last_completed_dt # Store the new datetime object
+                    }}
+                )
             print(f"User {current_user} completed daily challenge '{todays_challenge_word}'. New streak: {current_streak}") # Logging
 
         return jsonify(results), 200
@@ -863,41 +928,115 @@ def api_detect():
         error_response = {"status": "error", "message": f"Detection failed: {str(e)}", "completed_challenge": challenge_completed_today}
         return jsonify(error_response), 500
 
-@app.route("/api/speech", methods=["POST"])
-@jwt_required()
-def api_speech():
+# The upload is streamed straight to the speech upstream rather than buffered (see utils/speech_upload.py)
+@asgi_app.route("/api/speech", methods=["POST"], jwt_required=True,
+                stream_body=True, max_body_size=SPEECH_MAX_AUDIO_BYTES + 64 * 1024)
+async def api_speech():
     """
     Process speech audio for translation or transcription
     Form data: audio, format, lang1, lang2
     Returns: Processing results or error
     """
-    if 'audio' not in request.files:
-        return jsonify({"status": "error", "message": "No audio file provided"}), 400
-
-    file = request.files['audio']
-    audio_format = request.form.get('format')
-    lang1 = request.form.get('lang1')
-    lang2 = request.form.get('lang2')
-
-    if not audio_format or not lang1 or not lang2:
-        return jsonify({"status": "error", "message": "Missing required parameters: format, lang1, lang2"}), 400
-
     try:
-        result = asyncio.run(_run_speech(file, audio_format, lang1, lang2))
+        result = await handle_streamed_speech_request(request_body_stream(), request.content_type)
         return jsonify(result), 200
+    except SpeechUploadError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except HTTPException:
+        raise # e.g. 413 when the audio exceeds SPEECH_MAX_AUDIO_BYTES
     except Exception as e:
         import traceback
         print(f"Error in /api/speech: {e}\n{traceback.format_exc()}")
         return jsonify({"status": "error", "message": f"Speech processing failed: {str(e)}"}), 500
 
-@app.route("/api/speech/config", methods=["GET"])
-@jwt_required()
-def api_speech_config():
+# Job mode: the connection is released once the upload is read and a worker
+# picks the job up; the app polls (or long-polls) for the result.
+@asgi_app.route("/api/speech/jobs", methods=["POST"], jwt_required=True,
+                stream_body=True, max_body_size=SPEECH_MAX_AUDIO_BYTES + 64 * 1024)
+async def api_speech_job_submit():
     """
-    Get speech processing configuration
-    Returns: Supported languages and options
+    Queue speech audio for translation or transcription
+    Form data: audio, format, lang1, lang2
+    Returns: 202 with job_id and status_url, or 503 when the queue is full
+    """
+    busy_headers = {"Retry-After": "5"}
+    try:
+        speech_jobs.check_capacity() # Refuse before reading the upload
+        audio, audio_format, context = await read_speech_upload(request_body_stream(), request.content_type)
+        job = speech_jobs.submit(get_jwt_identity(), audio, audio_format, context)
+    except JobQueueFull as e:
+        return jsonify({"status": "error", "message": str(e)}), 503, busy_headers
+    except ValueError as e:
+        # Malformed upload or unsupported languages
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        print(f"Error in /api/speech/jobs: {e}\n{traceback.format_exc()}")
+        return jsonify({"status": "error", "message": f"Speech processing failed: {str(e)}"}), 500
+
+    status_url = url_for("api_speech_job", job_id=job.id)
+    response = job.as_dict()
+    response["status_url"] = status_url
+    return jsonify(response), 202, {"Location": status_url}
+
+@asgi_app.route("/api/speech/jobs/<job_id>", methods=["GET"], jwt_required=True)
+async def api_speech_job(job_id):
+    """
+    Status of a speech job; the result is included once it is done
+    Query params: wait (optional) - seconds to wait for the job to finish (long-poll)
+    Returns: job_id, status (queued/running/done/failed/cancelled), result
     """
-    supported_languages =  [
+    job = speech_jobs.get(job_id, get_jwt_identity())
+    if job is None:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+    wait = request.args.get("wait", default=0.0, type=float)
+    await job.wait(min(max(wait, 0.0), SPEECH_JOB_MAX_WAIT))
+    return jsonify(job.as_dict()), 200
+
+@asgi_app.route("/api/speech/jobs/<job_id>", methods=["DELETE"], jwt_required=True)
+async def api_speech_job_cancel(job_id):
+    """
+    Cancel a queued or running speech job
+    Returns: the job's final state (409 if it had already finished)
+    """
+    job = speech_jobs.get(job_id, get_jwt_identity())
+    if job is None:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+    if not speech_jobs.cancel(job):
+        return jsonify(job.as_dict()), 409
+    return jsonify(job.as_dict()), 200
+
+@asgi_app.route("/api/speech/segments", methods=["POST"], jwt_required=True,
+                stream_body=True, max_body_size=SPEECH_MAX_AUDIO_BYTES + 64 * 1024)
+async def api_speech_segments():
+    """
+    Segmented speech translation: the clip is split at pauses and one result
+    per segment is streamed back, in order, as soon as it is ready
+    Form data: audio, format, lang1, lang2
+    Returns: NDJSON lines (SSE events with Accept: text/event-stream), each
+    like /api/speech plus segment, segments, start_ms, end_ms, then
+    {"type": "done", "segments": n}
+    """
+    try:
+        audio, audio_format, context = await read_speech_upload(request_body_stream(), request.content_type)
+    except ValueError as e:
+        # Malformed upload or unsupported languages
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        print(f"Error in /api/speech/segments: {e}\n{traceback.format_exc()}")
+        return jsonify({"status": "error", "message": f"Speech processing failed: {str(e)}"}), 500
+
+    mimetype = request.accept_mimetypes.best_match(["application/x-ndjson", "text/event-stream"])
+    event_stream = mimetype == "text/event-stream"
+    chunks = stream_segmented_speech(audio, audio_format, context, event_stream=event_stream)
+    return stream_response(chunks, "text/event-stream" if event_stream else "application/x-ndjson")
+
+SPEECH_SUPPORTED_LANGUAGES = [
     "en",  # English
     "hi",  # Hindi
     "gu",  # Gujarati
@@ -908,10 +1047,19 @@ def api_speech_config():
     "zh",  # Chinese
     "ja",  # Japanese
     "ru"   # Russian
-  ]
-    return jsonify({
-        "supported_languages": supported_languages
-    }), 200
+]
+
+@app.route("/api/speech/config", methods=["GET"])
+@jwt_required()
+def api_speech_config():
+    """
+    Get speech processing configuration
+    Returns: Supported languages and options
+    """
+    return send_prepared(prepared_body(
+        ("speech_config",), SPEECH_SUPPORTED_LANGUAGES,
+        lambda: {"supported_languages": SPEECH_SUPPORTED_LANGUAGES}
+    ), max_age=STATIC_CONTENT_MAX_AGE)
 
 @app.route("/api/phrases", methods=["GET"])
 @jwt_required()
@@ -937,43 +1085,23 @@ def get_phrases():
         
         target_language = user.get('target_language', 'en')  # Default to English if not set
     
-    # Path to phrases file
-    phrases_file_path = os.path.join('utils', 'phrases', 'phrases.json')
-    
-    try:
-        with open(phrases_file_path, 'r', encoding='utf-8') as f:
-            all_phrases = json.load(f)
-            
-        # Check if the requested language exists in the phrases
-        if target_language not in all_phrases:
-            return jsonify({
-                "msg": f"Phrases not available for language code: {target_language}",
-                "available_languages": list(all_phrases.keys())
-            }), 404
-            
-        # Return phrases for the target language
-        phrases = all_phrases[target_language]
-        
-        # Group phrases by category (optional)
-        phrases_by_category = {}
-        for phrase in phrases:
-            category = phrase.get('category', 'Uncategorized')
-            if category not in phrases_by_category:
-                phrases_by_category[category] = []
-            phrases_by_category[category].append(phrase)
-        
-        return jsonify({
-            "target_language": target_language,
-            "phrases": phrases,
-            "phrases_by_category": phrases_by_category
-        }), 200
-        
-    except FileNotFoundError:
+    # Phrases (and their grouping by category) come from the content store
+    if not content_store.phrases_loaded():
         return jsonify({"msg": "Phrases file not found"}), 500
-    except json.JSONDecodeError:
-        return jsonify({"msg": "Error parsing phrases file"}), 500
-    except Exception as e:
-        return jsonify({"msg": f"An error occurred: {str(e)}"}), 500
+    phrase_book = content_store.phrase_book(target_language)
+
+    # Check if the requested language exists in the phrases
+    if phrase_book is None:
+        return jsonify({
+            "msg": f"Phrases not available for language code: {target_language}",
+            "available_languages": content_store.phrase_languages()
+        }), 404
+
+    return send_prepared(prepared_body(("phrases", target_language), phrase_book, lambda: {
+        "target_language": target_language,
+        "phrases": phrase_book.phrases,
+        "phrases_by_category": phrase_book.by_category
+    }))
 
 @app.route("/api/guidebook", methods=["GET"])
 @jwt_required()
@@ -1000,19 +1128,8 @@ def get_guidebook():
         target_language = user.get('target_language', 'en')  # Default to English if not set
     
     # Map language code to language name for guidebook file naming
-    language_names = {
-        'en': 'english',
-        'hi': 'hindi',
-        'gu': 'gujarati',
-        'kn': 'kannada',
-        'mr': 'marathi',
-        'fr': 'french',
-        'es': 'spanish',
-        'zh': 'chinese',
-        'ja': 'japanese',
-        'ru': 'russian'
-    }
-    
+    language_names = GUIDEBOOK_LANGUAGES
+
     # Get the language name from the code
     language_name = language_names.get(target_language)
     if not language_name:
@@ -1021,34 +1138,59 @@ def get_guidebook():
             "available_languages": list(language_names.keys())
         }), 404
     
-    # Path to guidebook file
-    guidebook_file_path = os.path.join('utils', 'guidebook', f'{language_name}_guidebook.json')
-    
-    try:
-        with open(guidebook_file_path, 'r', encoding='utf-8') as f:
-            guidebook = json.load(f)
-            
-        return jsonify({
-            "target_language": target_language,
-            "language_name": language_name,
-            "guidebook": guidebook
-        }), 200
-        
-    except FileNotFoundError:
+    # Served from memory (utils/guidebook/<language>_guidebook.json, see content_store)
+    guidebook = content_store.guidebook(language_name)
+    if guidebook is None:
         return jsonify({
             "msg": f"Guidebook file not found for language: {language_name}",
             "available_languages": list(language_names.keys())
         }), 404
-    except json.JSONDecodeError:
-        return jsonify({"msg": "Error parsing guidebook file"}), 500
-    except Exception as e:
-        return jsonify({"msg": f"An error occurred: {str(e)}"}), 500
 
-# --- Phrase Generation Endpoint ---
+    return send_prepared(prepared_body(("guidebook", target_language), guidebook, lambda: {
+        "target_language": target_language,
+        "language_name": language_name,
+        "guidebook": guidebook
+    }))
 
-@app.route("/api/phrase", methods=["POST"])
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+
+@app.route("/api/search", methods=["GET"])
 @jwt_required()
-async def generate_phrase(): # Make the function async
+def search_content():
+    """
+    Search phrasebook and guidebook entries of every language.
+    Query params:
+        q - text to look for in label1, label2 or category (any script)
+        lang (optional) - only entries of this language code
+        source (optional) - 'phrases' or 'guidebook'
+        limit (optional) - number of results, 1-100 (default 20)
+    Returns: Matching entries, best first, with their score
+    """
+    query = (request.args.get('q') or '').strip()
+    if not query:
+        return jsonify({"msg": "Missing 'q' query parameter"}), 400
+    source = request.args.get('source') or None
+    if source not in (None, 'phrases', 'guidebook'):
+        return jsonify({"msg": "'source' must be 'phrases' or 'guidebook'"}), 400
+    try:
+        limit = int(request.args.get('limit', SEARCH_DEFAULT_LIMIT))
+        if not 1 <= limit <= SEARCH_MAX_LIMIT:
+            raise ValueError
+    except ValueError:
+        return jsonify({"msg": f"'limit' must be between 1 and {SEARCH_MAX_LIMIT}"}), 400
+
+    with span("search"):
+        matches = content_search.search(query, limit=limit, language=request.args.get('lang') or None, source=source)
+    return jsonify({
+        "query": query,
+        "results": [dict(entry, score=score) for score, entry in matches]
+    }), 200
+
+# --- Phrase Generation Endpoint ---
+
+@asgi_app.route("/api/phrase", methods=["POST"], jwt_required=True)
+async def generate_phrase():
     data = request.get_json()
     word = data.get('word')
     target_language = data.get('target_language')
@@ -1080,9 +1222,9 @@ async def generate_phrase(): # Make the function async
         {{\"sentence1\": \"I read a book.\", \"sentence2\": \"The library contains a vast collection of historical books.\"}}
         """
 
-        # Note: Groq SDK might not be async, run in thread if it blocks
-        # For simplicity, assuming it's okay for now or non-blocking enough
-        chat_completion = client.chat.completions.create(
+        # The Groq SDK call blocks, so run it in a thread to keep the event loop free
+        chat_completion = await asyncio.to_thread(
+            client.chat.completions.create,
             messages=[
                 {
                     "role": "system",
@@ -1119,10 +1261,9 @@ async def generate_phrase(): # Make the function async
         # Translate if target language is not English
         if target_language != 'en':
             try:
-                translator = Translator()
-                # Create translation tasks
-                sentence1_translated_task = translator.translate(sentence1_en, dest=target_language)
-                sentence2_translated_task = translator.translate(sentence2_en, dest=target_language)
+                # Shared translator: pooled clients, rate limit, deadline and circuit breaker
+                sentence1_translated_task = translator_service.translate(sentence1_en, dest=target_language)
+                sentence2_translated_task = translator_service.translate(sentence2_en, dest=target_language)
 
                 # Run translations concurrently and await results
                 results = await asyncio.gather(sentence1_translated_task, sentence2_translated_task)
@@ -1135,6 +1276,9 @@ async def generate_phrase(): # Make the function async
                     "sentence2": sentence2_translated,
                     "original_word": word # Add original word
                 }
+            except TranslatorUnavailable as trans_err:
+                print(f"Translator unavailable: {trans_err}")
+                return jsonify({"msg": "Translation service temporarily unavailable"}), 503
             except Exception as trans_err:
                 print(f"Error translating sentences: {trans_err}")
                 # Fallback to English if translation fails?
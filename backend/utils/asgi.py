@@ -0,0 +1,257 @@
+"""
+ASGI front end for the Flask app.
+
+Routes registered with AsyncRouter.route run as coroutines directly on
+Hypercorn's event loop, so slow upstream calls do not hold a worker thread
+and can share loop-bound resources such as the pooled upstream session.
+Every other request is handed to Flask through Hypercorn's WSGI middleware.
+Native routes still run inside a Flask request context, so `request`,
+JWT helpers, error handlers and after_request hooks (logging, CORS) work
+as usual. Routes registered with stream_body=True are not buffered: the view
+reads the body chunk by chunk through request_body_stream(). A view can
+also return stream_response(...) to send its body as it is produced.
+"""
+import asyncio
+import sys
+from io import BytesIO
+from decouple import config
+from flask import Response, request
+from flask_jwt_extended import jwt_required as flask_jwt_required, verify_jwt_in_request
+from hypercorn.middleware import AsyncioWSGIMiddleware
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
+from werkzeug.routing import Map, Rule
+
+# Largest request body accepted (uploads are buffered before parsing)
+MAX_BODY_SIZE = config('MAX_REQUEST_BODY_BYTES', default=16 * 1024 * 1024, cast=int)
+STREAM_CHUNK_SIZE = 64 * 1024
+BODY_STREAM_KEY = "lingual.body_stream"
+
+
+class BodyStream:
+    """Async iterator over an ASGI request body, enforcing a size limit as it reads."""
+
+    def __init__(self, receive, max_size):
+        self.receive = receive
+        self.max_size = max_size
+        self.received = 0
+        self.finished = False
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        while not self.finished:
+            message = await self.receive()
+            if message["type"] == "http.disconnect":
+                raise ConnectionError("Client disconnected during upload")
+            body = message.get("body", b"")
+            self.received += len(body)
+            if self.received > self.max_size:
+                raise RequestEntityTooLarge()
+            self.finished = not message.get("more_body")
+            if body:
+                yield body
+
+
+async def _wsgi_body_chunks(stream, chunk_size):
+    while True:
+        chunk = await asyncio.to_thread(stream.read, chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def request_body_stream(chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Async iterator over the current request body. Streamed from the ASGI
+    connection for stream_body routes, read from the WSGI input otherwise
+    (e.g. when the Flask app is served on its own).
+    """
+    stream = request.environ.get(BODY_STREAM_KEY)
+    if stream is not None:
+        return stream
+    return _wsgi_body_chunks(request.stream, chunk_size)
+
+
+def build_environ(scope, body):
+    """Build a WSGI environ for a buffered ASGI HTTP request."""
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf8").decode("latin1"),
+        "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+        "QUERY_STRING": scope["query_string"].decode("ascii"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": BytesIO(body),
+        "wsgi.input_terminated": True,  # Body is fully buffered, even without Content-Length
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"] = scope["client"][0]
+    for raw_name, raw_value in scope.get("headers", []):
+        name = raw_name.decode("latin1")
+        if name == "content-length":
+            key = "CONTENT_LENGTH"
+        elif name == "content-type":
+            key = "CONTENT_TYPE"
+        else:
+            key = "HTTP_" + name.upper().replace("-", "_")
+        value = raw_value.decode("latin1")
+        if key in environ:
+            value = f"{environ[key]},{value}"
+        environ[key] = value
+    return environ
+
+
+def stream_response(chunks, mimetype):
+    """
+    Response whose body is sent chunk by chunk from an async iterable of
+    bytes/str as it is produced. Only native (AsyncRouter) routes can send it.
+    """
+    response = Response(chunks, mimetype=mimetype)
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"  # Ask proxies not to buffer the stream
+    return response
+
+
+class AsyncRouter:
+    """ASGI app that runs selected async views natively and delegates the rest to Flask."""
+
+    def __init__(self, flask_app, max_body_size=MAX_BODY_SIZE):
+        self.flask_app = flask_app
+        self.max_body_size = max_body_size
+        self.wsgi = AsyncioWSGIMiddleware(flask_app, max_body_size)
+        self.url_map = Map()
+        self.views = {}
+        self.on_startup = []
+        self.on_shutdown = []
+
+    def route(self, rule, methods=("GET",), jwt_required=False, stream_body=False, max_body_size=None):
+        """
+        Register an async view to run on the event loop. The view is also added
+        to the Flask app, so it keeps working when Flask is served on its own.
+        With stream_body the body is not buffered; the view consumes it with
+        request_body_stream() (request.form/files stay empty).
+        """
+        def decorator(view):
+            endpoint = view.__name__
+            self.url_map.add(Rule(rule, endpoint=endpoint, methods=list(methods)))
+            self.views[endpoint] = (view, jwt_required, stream_body, max_body_size or self.max_body_size)
+            flask_view = flask_jwt_required()(view) if jwt_required else view
+            self.flask_app.add_url_rule(rule, endpoint=endpoint, view_func=flask_view, methods=list(methods))
+            return view
+        return decorator
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] == "http":
+            adapter = self.url_map.bind("localhost")
+            try:
+                endpoint, kwargs = adapter.match(scope["path"], method=scope["method"])
+            except HTTPException:
+                endpoint = None  # Not ours (or OPTIONS preflight) - let Flask answer
+            if endpoint is not None:
+                await self._handle(scope, receive, send, endpoint, kwargs)
+                return
+        await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    for hook in self.on_startup:
+                        await hook()
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for hook in self.on_shutdown:
+                    try:
+                        await hook()
+                    except Exception as e:
+                        print(f"Error during shutdown hook {hook.__name__}: {e}")
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _read_body(self, receive, max_size):
+        body = bytearray()
+        while True:
+            message = await receive()
+            body.extend(message.get("body", b""))
+            if len(body) > max_size:
+                return None
+            if not message.get("more_body"):
+                return bytes(body)
+
+    async def _handle(self, scope, receive, send, endpoint, kwargs):
+        view, needs_jwt, stream_body, max_body_size = self.views[endpoint]
+        if stream_body:
+            environ = build_environ(scope, b"")
+            environ[BODY_STREAM_KEY] = BodyStream(receive, max_body_size)
+        else:
+            body = await self._read_body(receive, max_body_size)
+            if body is None:
+                await self._send_plain(send, 413, b"Request body too large")
+                return
+            environ = build_environ(scope, body)
+
+        app = self.flask_app
+        ctx = app.request_context(environ)
+        ctx.push()
+        try:
+            try:
+                rv = app.preprocess_request()
+                if rv is None:
+                    if needs_jwt:
+                        verify_jwt_in_request()
+                    rv = await view(**kwargs)
+            except Exception as e:
+                # JWT errors, aborts and registered error handlers
+                rv = app.handle_user_exception(e)
+            response = app.process_response(app.make_response(rv))
+        except Exception as e:
+            response = app.make_response(app.handle_exception(e))
+        finally:
+            ctx.pop()
+        await self._send_response(send, response)
+
+    async def _send_response(self, send, response):
+        headers = [
+            (name.lower().encode("latin-1"), value.encode("latin-1"))
+            for name, value in response.headers.items()
+        ]
+        await send({"type": "http.response.start", "status": response.status_code, "headers": headers})
+        body = response.response
+        if hasattr(body, "__aiter__"):
+            # Streamed body (stream_response): forward chunks as they are produced
+            try:
+                async for chunk in body:
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode("utf-8")
+                    if chunk:
+                        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            finally:
+                if hasattr(body, "aclose"):
+                    await body.aclose()  # Stops the producer if the client went away
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        await send({"type": "http.response.body", "body": response.get_data(), "more_body": False})
+
+    async def _send_plain(self, send, status, body):
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"text/plain"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body, "more_body": False})
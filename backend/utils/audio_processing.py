@@ -0,0 +1,204 @@
+"""
+Optional server-side normalization of speech clips before upload.
+
+Clips are decoded, downmixed to mono, resampled to 16kHz, trimmed to the
+voiced region with an energy-based VAD and re-encoded as a small mono file,
+which is all the upstream ASR needs. Clips with no voiced frames are
+rejected without calling upstream. segment_audio() also splits a clip at
+pauses so long utterances can be translated piece by piece.
+
+Needs pydub and an ffmpeg binary (WAV works with pydub alone). Enable with
+AUDIO_PREPROCESS=True; when the dependencies are missing, or a clip cannot
+be decoded, the original audio is forwarded unchanged.
+"""
+import io
+import shutil
+import numpy as np
+from decouple import config
+
+try:
+    from pydub import AudioSegment
+except ImportError:  # Optional dependency
+    AudioSegment = None
+
+AUDIO_PREPROCESS = config('AUDIO_PREPROCESS', default=False, cast=bool)
+TARGET_SAMPLE_RATE = 16000
+# Frames quieter than this (dBFS) count as silence
+AUDIO_SILENCE_DBFS = config('AUDIO_SILENCE_DBFS', default=-45.0, cast=float)
+AUDIO_VAD_FRAME_MS = 30
+# Voiced audio needed for a clip to count as speech
+AUDIO_MIN_SPEECH_MS = config('AUDIO_MIN_SPEECH_MS', default=150, cast=int)
+# Silence kept around the voiced region so word edges are not clipped
+AUDIO_TRIM_PADDING_MS = config('AUDIO_TRIM_PADDING_MS', default=200, cast=int)
+# Segmentation: cut at pauses of at least this long, keep pieces between the min and max length
+AUDIO_SEGMENT_MIN_SILENCE_MS = config('AUDIO_SEGMENT_MIN_SILENCE_MS', default=400, cast=int)
+AUDIO_SEGMENT_MIN_MS = config('AUDIO_SEGMENT_MIN_MS', default=1000, cast=int)
+AUDIO_SEGMENT_MAX_MS = config('AUDIO_SEGMENT_MAX_MS', default=15000, cast=int)
+AUDIO_ENCODE_FORMAT = config('AUDIO_ENCODE_FORMAT', default='mp3')
+AUDIO_ENCODE_BITRATE = config('AUDIO_ENCODE_BITRATE', default='32k')
+
+# Formats pydub can decode without ffmpeg
+_NATIVE_FORMATS = ('wav',)
+
+
+class SilentAudioError(ValueError):
+    """The clip contains no speech."""
+
+
+class ProcessedAudio:
+    """A normalized clip ready for upload."""
+
+    def __init__(self, data, format, duration_ms, original_duration_ms, original_size, start_ms=0):
+        self.data = data
+        self.format = format
+        self.duration_ms = duration_ms
+        self.original_duration_ms = original_duration_ms
+        self.original_size = original_size
+        # Position of this audio within the original clip
+        self.start_ms = start_ms
+
+    @property
+    def end_ms(self):
+        return self.start_ms + self.duration_ms
+
+    def __repr__(self):
+        return (f"ProcessedAudio(format={self.format!r}, {self.original_size}B/{self.original_duration_ms}ms"
+                f" -> {len(self.data)}B/{self.duration_ms}ms)")
+
+
+def preprocessing_available(audio_format=None):
+    """True when clips of this format can be decoded and re-encoded here."""
+    if AudioSegment is None:
+        return False
+    needs_ffmpeg = audio_format not in _NATIVE_FORMATS or AUDIO_ENCODE_FORMAT not in _NATIVE_FORMATS
+    return not needs_ffmpeg or shutil.which("ffmpeg") is not None
+
+
+def frame_energies(samples, sample_rate, frame_ms=AUDIO_VAD_FRAME_MS):
+    """Per-frame RMS level in dBFS for int16 mono samples."""
+    frame_len = max(1, sample_rate * frame_ms // 1000)
+    n_frames = len(samples) // frame_len
+    if n_frames == 0:
+        return np.empty(0)
+    frames = samples[:n_frames * frame_len].astype(np.float32).reshape(n_frames, frame_len)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1.0) / 32768.0)
+
+
+def voiced_range(samples, sample_rate, threshold_dbfs=AUDIO_SILENCE_DBFS, frame_ms=AUDIO_VAD_FRAME_MS,
+                 min_speech_ms=AUDIO_MIN_SPEECH_MS, padding_ms=AUDIO_TRIM_PADDING_MS):
+    """
+    Return (start_ms, end_ms) of the voiced region, padded, or None when the
+    clip holds less than min_speech_ms of frames above threshold_dbfs.
+    """
+    voiced = np.flatnonzero(frame_energies(samples, sample_rate, frame_ms) > threshold_dbfs)
+    if len(voiced) * frame_ms < min_speech_ms:
+        return None
+    duration_ms = len(samples) * 1000 // sample_rate
+    start_ms = max(0, int(voiced[0]) * frame_ms - padding_ms)
+    end_ms = min(duration_ms, (int(voiced[-1]) + 1) * frame_ms + padding_ms)
+    return start_ms, end_ms
+
+
+def speech_segments(samples, sample_rate, threshold_dbfs=AUDIO_SILENCE_DBFS, frame_ms=AUDIO_VAD_FRAME_MS,
+                    min_speech_ms=AUDIO_MIN_SPEECH_MS, min_silence_ms=AUDIO_SEGMENT_MIN_SILENCE_MS,
+                    min_segment_ms=AUDIO_SEGMENT_MIN_MS, max_segment_ms=AUDIO_SEGMENT_MAX_MS,
+                    padding_ms=AUDIO_TRIM_PADDING_MS):
+    """
+    Split a clip into voiced pieces at pauses. Returns [(start_ms, end_ms)]
+    in order (empty when the clip holds no speech). Pieces shorter than
+    min_segment_ms are merged into a neighbour and pieces longer than
+    max_segment_ms are cut at their quietest frame.
+    """
+    energies = frame_energies(samples, sample_rate, frame_ms)
+    voiced = energies > threshold_dbfs
+    if voiced.sum() * frame_ms < min_speech_ms:
+        return []
+
+    # Voiced runs separated by at least min_silence_ms of silence, in frames
+    min_gap = max(1, min_silence_ms // frame_ms)
+    voiced_idx = np.flatnonzero(voiced)
+    breaks = np.flatnonzero(np.diff(voiced_idx) > min_gap)
+    starts = np.concatenate(([voiced_idx[0]], voiced_idx[breaks + 1]))
+    ends = np.concatenate((voiced_idx[breaks] + 1, [voiced_idx[-1] + 1]))
+    pieces = [[int(start), int(end)] for start, end in zip(starts, ends)]
+
+    # Merge pieces that are too short to be worth a separate upstream call
+    min_frames = max(1, min_segment_ms // frame_ms)
+    merged = []
+    for piece in pieces:
+        if merged and (merged[-1][1] - merged[-1][0] < min_frames or piece[1] - piece[0] < min_frames):
+            merged[-1][1] = piece[1]
+        else:
+            merged.append(piece)
+
+    # Cut pieces that are too long at the quietest frame in the allowed window
+    max_frames = max(min_frames + 1, max_segment_ms // frame_ms)
+    bounded = []
+    for start, end in merged:
+        while end - start > max_frames:
+            window = energies[start + min_frames:start + max_frames]
+            cut = start + min_frames + int(np.argmin(window))
+            bounded.append((start, cut))
+            start = cut
+        bounded.append((start, end))
+
+    # Frames -> ms, padded but never overlapping the neighbouring piece
+    duration_ms = len(samples) * 1000 // sample_rate
+    segments = []
+    for i, (start, end) in enumerate(bounded):
+        start_ms, end_ms = start * frame_ms, end * frame_ms
+        prev_end = bounded[i - 1][1] * frame_ms if i > 0 else 0
+        next_start = bounded[i + 1][0] * frame_ms if i + 1 < len(bounded) else duration_ms
+        start_ms = max(start_ms - padding_ms, (prev_end + start_ms) // 2 if i > 0 else 0)
+        end_ms = min(end_ms + padding_ms, (end_ms + next_start) // 2 if i + 1 < len(bounded) else duration_ms)
+        segments.append((start_ms, end_ms))
+    return segments
+
+
+def _decode_normalized(audio_bytes, audio_format):
+    """Decode a clip as 16kHz mono int16. Returns (segment, original_duration_ms)."""
+    segment = AudioSegment.from_file(io.BytesIO(audio_bytes), format=audio_format)
+    original_duration_ms = len(segment)
+    segment = segment.set_channels(1).set_frame_rate(TARGET_SAMPLE_RATE).set_sample_width(2)
+    return segment, original_duration_ms
+
+
+def _encode(segment):
+    out = io.BytesIO()
+    export_args = {} if AUDIO_ENCODE_FORMAT in _NATIVE_FORMATS else {"bitrate": AUDIO_ENCODE_BITRATE}
+    segment.export(out, format=AUDIO_ENCODE_FORMAT, **export_args)
+    return out.getvalue()
+
+
+def preprocess_audio(audio_bytes, audio_format):
+    """
+    Decode, downmix, resample, trim and re-encode a clip. Raises
+    SilentAudioError for clips without speech; decode errors propagate.
+    """
+    segment, original_duration_ms = _decode_normalized(audio_bytes, audio_format)
+    samples = np.frombuffer(segment.raw_data, dtype=np.int16)
+    bounds = voiced_range(samples, TARGET_SAMPLE_RATE)
+    if bounds is None:
+        raise SilentAudioError("No speech detected in the audio")
+    segment = segment[bounds[0]:bounds[1]]
+    return ProcessedAudio(_encode(segment), AUDIO_ENCODE_FORMAT, len(segment), original_duration_ms,
+                          len(audio_bytes), start_ms=bounds[0])
+
+
+def segment_audio(audio_bytes, audio_format):
+    """
+    Normalize a clip and split it at pauses. Returns a list of ProcessedAudio
+    pieces in order; raises SilentAudioError for clips without speech.
+    """
+    segment, original_duration_ms = _decode_normalized(audio_bytes, audio_format)
+    samples = np.frombuffer(segment.raw_data, dtype=np.int16)
+    bounds = speech_segments(samples, TARGET_SAMPLE_RATE)
+    if not bounds:
+        raise SilentAudioError("No speech detected in the audio")
+    pieces = []
+    for start_ms, end_ms in bounds:
+        piece = segment[start_ms:end_ms]
+        pieces.append(ProcessedAudio(_encode(piece), AUDIO_ENCODE_FORMAT, len(piece), original_duration_ms,
+                                     len(audio_bytes), start_ms=start_ms))
+    return pieces
@@ -0,0 +1,89 @@
+"""
+Build the offline label dictionary (utils/labels/label_translations.json).
+
+Translates every detector class into each supported language with googletrans
+and writes the table that DetectionService loads at startup. Existing entries
+are kept unless --refresh is given, so hand-corrected translations survive a
+rebuild. Run from the backend directory:
+
+    python -m utils.build_label_dictionary [--refresh] [--labels extra.txt] [--check]
+"""
+import argparse
+import asyncio
+import json
+import sys
+from googletrans import Translator
+from utils.label_translation import LABEL_DICTIONARY_PATH
+from utils.model_manager import COCO_CLASSES
+
+# Keep in sync with ALLOWED_LANGUAGES in api_handler.py (English needs no table)
+LABEL_LANGUAGES = ['hi', 'gu', 'mr', 'kn']
+
+
+def read_dictionary(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get("labels", {})
+    except FileNotFoundError:
+        return {}
+
+
+def write_dictionary(path, labels):
+    data = {"version": 1, "languages": LABEL_LANGUAGES, "labels": labels}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.write('\n')
+
+
+def missing_entries(labels, names, refresh=False):
+    """(label, lang) pairs that still need a translation."""
+    return [
+        (name, lang) for name in names for lang in LABEL_LANGUAGES
+        if refresh or not labels.get(name, {}).get(lang)
+    ]
+
+
+async def translate_entries(entries):
+    translator = Translator()
+    results = {}
+    for name, lang in entries:
+        try:
+            translated = await translator.translate(name, src='en', dest=lang)
+            results[(name, lang)] = translated.text
+            print(f"{name} -> {lang}: {translated.text}")
+        except Exception as e:
+            print(f"[WARN] Failed to translate '{name}' to {lang}: {e}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the offline label translation table")
+    parser.add_argument("--output", default=LABEL_DICTIONARY_PATH)
+    parser.add_argument("--labels", help="File with extra labels to include, one per line")
+    parser.add_argument("--refresh", action="store_true", help="Re-translate entries that already exist")
+    parser.add_argument("--check", action="store_true", help="Only report missing entries (exit 1 if any)")
+    args = parser.parse_args()
+
+    names = list(COCO_CLASSES)
+    if args.labels:
+        with open(args.labels, 'r', encoding='utf-8') as f:
+            names += [line.strip().lower() for line in f if line.strip()]
+    names = list(dict.fromkeys(names))
+
+    labels = read_dictionary(args.output)
+    entries = missing_entries(labels, names, args.refresh)
+    if args.check:
+        for name, lang in entries:
+            print(f"missing: {name} ({lang})")
+        print(f"{len(names) * len(LABEL_LANGUAGES) - len(entries)}/{len(names) * len(LABEL_LANGUAGES)} entries present")
+        sys.exit(1 if entries else 0)
+
+    translated = asyncio.run(translate_entries(entries))
+    for (name, lang), text in translated.items():
+        labels.setdefault(name, {})[lang] = text
+    write_dictionary(args.output, labels)
+    print(f"Wrote {len(labels)} labels ({len(translated)} newly translated) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
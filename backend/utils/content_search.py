@@ -0,0 +1,169 @@
+"""
+Search over the phrasebook and guidebook entries of every language.
+
+Entries are indexed on label1, label2 and category with character 2- and
+3-grams of each (NFKC-normalized, casefolded) word, which works the same for
+Latin, Devanagari, Gujarati, Kannada, Cyrillic and unsegmented CJK text. A
+query scores each entry by the idf-weighted share of its n-grams the entry
+contains (category matches count half), with a bonus when the whole query
+appears in a label. Postings are numpy arrays, so a query is a handful of
+vectorized additions. The index is built when the module is imported and
+rebuilt if the content store reloads a phrase or guidebook file.
+"""
+import math
+import threading
+import unicodedata
+import numpy as np
+from decouple import config
+from utils.content_store import GUIDEBOOK_LANGUAGES, content_store
+
+NGRAM_SIZES = (2, 3)
+# Field -> weight of the n-grams it contributes
+FIELD_WEIGHTS = (("label1", 1.0), ("label2", 1.0), ("category", 0.5))
+# Share of the query (by idf weight) an entry must match to be returned
+SEARCH_MIN_SCORE = config('SEARCH_MIN_SCORE', default=0.4, cast=float)
+EXACT_MATCH_BONUS = 0.5
+MAX_QUERY_CHARS = 200
+
+
+def _fold_char(ch):
+    category = unicodedata.category(ch)
+    if category == "Cf":
+        return ""  # Zero-width joiners inside Indic words
+    return " " if category[0] in "PSZC" else ch
+
+
+def normalize(text):
+    """NFKC + casefold, with punctuation and symbols turned into spaces (combining marks are kept)."""
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    return " ".join("".join(_fold_char(ch) for ch in text).split())
+
+
+def char_ngrams(text):
+    """Character n-grams of each word of normalized text, words padded with spaces."""
+    grams = set()
+    for word in text.split():
+        padded = f" {word} "
+        for n in NGRAM_SIZES:
+            grams.update(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return grams
+
+
+class SearchIndex:
+    """Inverted n-gram index over a fixed list of entries (dicts with label1/label2/category)."""
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.labels = []  # Normalized label1/label2 per entry, for the exact-match bonus
+        gram_docs = {}
+        for doc_id, entry in enumerate(entries):
+            weights = {}
+            for field, weight in FIELD_WEIGHTS:
+                for gram in char_ngrams(normalize(entry.get(field))):
+                    weights[gram] = max(weights.get(gram, 0.0), weight)
+            for gram, weight in weights.items():
+                gram_docs.setdefault(gram, []).append((doc_id, weight))
+            self.labels.append((normalize(entry.get("label1")), normalize(entry.get("label2"))))
+
+        total = max(1, len(entries))
+        self.postings = {}
+        self.idf = {}
+        for gram, docs in gram_docs.items():
+            self.postings[gram] = (
+                np.fromiter((doc_id for doc_id, _ in docs), dtype=np.int32, count=len(docs)),
+                np.fromiter((weight for _, weight in docs), dtype=np.float32, count=len(docs)),
+            )
+            self.idf[gram] = math.log(1 + total / len(docs))
+        self.unseen_idf = math.log(1 + total)  # Query n-grams no entry has still count against the score
+
+        self._masks = {}
+        for key in ("language", "source"):
+            values = np.array([entry[key] for entry in entries], dtype=object)
+            for value in set(values):
+                self._masks[(key, value)] = values == value
+
+    def search(self, query, limit=20, language=None, source=None):
+        """Return up to limit (score, entry) pairs, best first."""
+        text = normalize(query[:MAX_QUERY_CHARS])
+        grams = char_ngrams(text)
+        if not grams or not self.entries:
+            return []
+        scores = np.zeros(len(self.entries), dtype=np.float32)
+        total = 0.0
+        for gram in grams:
+            idf = self.idf.get(gram)
+            if idf is None:
+                total += self.unseen_idf
+                continue
+            doc_ids, weights = self.postings[gram]
+            scores[doc_ids] += weights * idf  # doc ids are unique within a posting list
+            total += idf
+        scores /= total
+
+        for key, value in (("language", language), ("source", source)):
+            if value is not None:
+                mask = self._masks.get((key, value))
+                if mask is None:
+                    return []
+                scores[~mask] = 0.0
+
+        candidates = np.flatnonzero(scores >= SEARCH_MIN_SCORE)
+        for doc_id in candidates:
+            if any(text in label for label in self.labels[doc_id]):
+                scores[doc_id] += EXACT_MATCH_BONUS
+        if len(candidates) > limit:
+            top = np.argpartition(-scores[candidates], limit - 1)[:limit]
+            candidates = candidates[top]
+        ranked = sorted(candidates, key=lambda doc_id: (-scores[doc_id], doc_id))
+        return [(round(float(scores[doc_id]), 4), self.entries[doc_id]) for doc_id in ranked]
+
+
+def _entries(phrases, guidebooks):
+    entries = []
+    for code, phrase_book in sorted(phrases.items()):
+        for phrase in phrase_book.phrases:
+            entries.append({"source": "phrases", "language": code, "section": None, **phrase})
+    for code, guidebook in guidebooks:
+        for section, items in guidebook.items():
+            for item in items:
+                entries.append({"source": "guidebook", "language": code, "section": section, **item})
+    return entries
+
+
+class ContentSearch:
+    """Keeps a SearchIndex in step with the content store."""
+
+    def __init__(self, store=content_store):
+        self.store = store
+        self._index = None
+        self._sources = None
+        self._lock = threading.Lock()
+
+    def _changed(self, sources):
+        return self._sources is None or len(sources) != len(self._sources) or any(
+            current is not previous for current, previous in zip(sources, self._sources)
+        )
+
+    def index(self):
+        """Current SearchIndex, rebuilt if a source file was reloaded."""
+        phrases = self.store.phrase_file.get()
+        guidebooks = []
+        for code, name in GUIDEBOOK_LANGUAGES.items():
+            guidebook = self.store.guidebook(name)
+            if guidebook is not None:
+                guidebooks.append((code, guidebook))
+        sources = (phrases, *(guidebook for _, guidebook in guidebooks))
+        if self._changed(sources):
+            with self._lock:
+                if self._changed(sources):
+                    self._index = SearchIndex(_entries(phrases or {}, guidebooks))
+                    self._sources = sources
+        return self._index
+
+    def search(self, query, limit=20, language=None, source=None):
+        return self.index().search(query, limit, language, source)
+
+
+# Create global search instance (builds the index up front)
+content_search = ContentSearch()
+content_search.index()
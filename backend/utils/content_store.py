@@ -0,0 +1,244 @@
+"""
+In-memory copy of the static learning content under utils/ (quizzes,
+guidebooks, phrases and daily challenges).
+
+Every file is parsed once at startup, together with the lookups the
+endpoints need (phrases grouped by category, challenge word per day), and
+requests are served from memory. A file is re-parsed only when its mtime
+changes; mtimes are checked at most every CONTENT_RELOAD_INTERVAL seconds,
+so edits to the JSON show up without a restart. A file that fails to parse
+keeps serving its previous contents.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from decouple import config
+
+CONTENT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Seconds between mtime checks of a content file (negative disables reloading)
+CONTENT_RELOAD_INTERVAL = config('CONTENT_RELOAD_INTERVAL', default=5.0, cast=float)
+
+# Language code -> language name used in guidebook file names
+GUIDEBOOK_LANGUAGES = {
+    'en': 'english',
+    'hi': 'hindi',
+    'gu': 'gujarati',
+    'kn': 'kannada',
+    'mr': 'marathi',
+    'fr': 'french',
+    'es': 'spanish',
+    'zh': 'chinese',
+    'ja': 'japanese',
+    'ru': 'russian'
+}
+
+
+class ContentFile:
+    """One JSON file, parsed (and passed through `build`) once, re-parsed when its mtime changes."""
+
+    def __init__(self, path, build=None, reload_interval=CONTENT_RELOAD_INTERVAL):
+        self.path = path
+        self.build = build or (lambda data: data)
+        self.reload_interval = reload_interval
+        self._value = None
+        self._mtime = None
+        self._checked = None
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.errors = 0
+
+    def get(self):
+        """The parsed contents, or None if the file is missing or has never parsed."""
+        now = time.monotonic()
+        checked = self._checked
+        if checked is None or (self.reload_interval >= 0 and now - checked >= self.reload_interval):
+            with self._lock:
+                if self._checked == checked:
+                    self._checked = now
+                    self._refresh()
+        return self._value
+
+    def _refresh(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            if self._mtime is not None:
+                print(f"[WARN] Content file {self.path} disappeared; serving the last loaded copy")
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                value = self.build(json.load(f))
+        except (OSError, ValueError) as e:
+            self.errors += 1
+            print(f"[WARN] Could not load content file {self.path}: {e}")
+            self._mtime = mtime  # Don't retry until the file changes again
+            return
+        self._value = value
+        self._mtime = mtime
+        self.loads += 1
+
+
+class QuizIndex:
+    """
+    Questions of one language with posting lists (sorted question positions)
+    by level, by type and by (level, type), so filtered pages and counts
+    never scan the whole list.
+    """
+
+    def __init__(self, questions):
+        self.questions = questions if isinstance(questions, list) else []
+        self.by_level = {}
+        self.by_type = {}
+        self.by_level_type = {}
+        for position, question in enumerate(self.questions):
+            level, question_type = question.get('level'), question.get('type')
+            self.by_level.setdefault(level, []).append(position)
+            self.by_type.setdefault(question_type, []).append(position)
+            self.by_level_type.setdefault((level, question_type), []).append(position)
+        self._all = range(len(self.questions))
+
+    def __len__(self):
+        return len(self.questions)
+
+    def postings(self, level=None, question_type=None):
+        """Sorted positions of the questions matching the filters (None = any)."""
+        if level is None and question_type is None:
+            return self._all
+        if question_type is None:
+            return self.by_level.get(level, ())
+        if level is None:
+            return self.by_type.get(question_type, ())
+        return self.by_level_type.get((level, question_type), ())
+
+    def count(self, level=None, question_type=None):
+        return len(self.postings(level, question_type))
+
+    def page(self, cursor=0, limit=10, level=None, question_type=None):
+        """
+        Up to limit matching questions at or after position `cursor`.
+        Returns (questions, next_cursor); next_cursor is None on the last page.
+        """
+        postings = self.postings(level, question_type)
+        start = bisect.bisect_left(postings, cursor)
+        positions = postings[start:start + limit]
+        next_cursor = positions[-1] + 1 if start + limit < len(postings) else None
+        return [self.questions[position] for position in positions], next_cursor
+
+    def facets(self):
+        """Question counts per level and per type."""
+        return {
+            "levels": {level: len(positions) for level, positions in self.by_level.items() if level is not None},
+            "types": {name: len(positions) for name, positions in self.by_type.items() if name is not None},
+        }
+
+
+class PhraseBook:
+    """Phrases of one language, plus the same list grouped by category."""
+
+    def __init__(self, phrases):
+        self.phrases = phrases
+        self.by_category = {}
+        for phrase in phrases:
+            self.by_category.setdefault(phrase.get('category', 'Uncategorized'), []).append(phrase)
+
+
+class DailyChallenges:
+    """Challenge words, indexed by day of the month."""
+
+    def __init__(self, items):
+        self.items = items or []
+        self.by_day = {}
+        for item in self.items:
+            if item.get('day') is not None and item.get('challenge'):
+                self.by_day.setdefault(item['day'], item['challenge'])
+
+    def word_for(self, day):
+        """Challenge for a date: by day of the month, else cycling through the list by day of the year."""
+        word = self.by_day.get(day.day)
+        if not word and self.items:
+            print(f"Warning: No challenge found for day {day.day}. Using fallback.")
+            word = self.items[(day.timetuple().tm_yday - 1) % len(self.items)].get('challenge')
+        return word.lower() if word else None
+
+
+def _build_phrases(data):
+    return {code: PhraseBook(phrases) for code, phrases in data.items()}
+
+
+class ContentStore:
+    """
+    Static content by language. Quizzes and guidebooks are keyed by the
+    language name used in their file names ('hindi', 'english', ...).
+    """
+
+    def __init__(self, root=CONTENT_DIR):
+        self.root = root
+        self.quizzes = {}
+        quiz_dir = os.path.join(root, 'quiz')
+        for name in sorted(os.listdir(quiz_dir)) if os.path.isdir(quiz_dir) else []:
+            # <language>_quiz_dataset.json wins over <language>_quiz.json
+            for suffix in ('_quiz_dataset.json', '_quiz.json'):
+                if name.endswith(suffix):
+                    language = name[:-len(suffix)]
+                    if suffix == '_quiz_dataset.json' or language not in self.quizzes:
+                        self.quizzes[language] = ContentFile(os.path.join(quiz_dir, name), build=QuizIndex)
+        self.guidebooks = {}
+        guidebook_dir = os.path.join(root, 'guidebook')
+        for name in sorted(os.listdir(guidebook_dir)) if os.path.isdir(guidebook_dir) else []:
+            if name.endswith('_guidebook.json'):
+                self.guidebooks[name[:-len('_guidebook.json')]] = ContentFile(os.path.join(guidebook_dir, name))
+        self.phrase_file = ContentFile(os.path.join(root, 'phrases', 'phrases.json'), build=_build_phrases)
+        self.challenge_file = ContentFile(os.path.join(root, 'quiz', 'daily_challenges.json'), build=DailyChallenges)
+
+    def _files(self):
+        return [*self.quizzes.values(), *self.guidebooks.values(), self.phrase_file, self.challenge_file]
+
+    def load_all(self):
+        """Parse every content file now (called at import so requests never wait on a first load)."""
+        for content in self._files():
+            content.get()
+
+    def quiz(self, language_name):
+        """QuizIndex for a language, or None if there is no quiz file for it."""
+        content = self.quizzes.get(language_name)
+        return content.get() if content else None
+
+    def quiz_length(self, language_name):
+        quiz = self.quiz(language_name)
+        return len(quiz) if quiz is not None else 0
+
+    def guidebook(self, language_name):
+        content = self.guidebooks.get(language_name)
+        return content.get() if content else None
+
+    def phrase_book(self, language_code):
+        """PhraseBook for a language code, or None."""
+        return (self.phrase_file.get() or {}).get(language_code)
+
+    def phrase_languages(self):
+        return list(self.phrase_file.get() or {})
+
+    def phrases_loaded(self):
+        return self.phrase_file.get() is not None
+
+    def daily_challenges(self):
+        """DailyChallenges, or None if the file is missing or invalid."""
+        return self.challenge_file.get()
+
+    def stats(self):
+        files = self._files()
+        return {
+            "files": len(files),
+            "loaded": sum(1 for content in files if content._value is not None),
+            "loads": sum(content.loads for content in files),
+            "errors": sum(content.errors for content in files),
+        }
+
+
+# Create global store instance (loads everything up front)
+content_store = ContentStore()
+content_store.load_all()
@@ -10,20 +10,46 @@ import time
 import aiohttp
 # from collections import deque # Removed deque import
 from skimage.metrics import structural_similarity as ssim
-from googletrans import Translator # Ensure Translator is imported
 from PIL import Image, ImageDraw, ImageFont
 import io
+from utils.image_utils import PreparedUpload, encode_frame, make_thumbnail, prepare_detection_upload, scale_box
+from utils.cache import LRUCache
+from utils.translation_cache import translation_cache
+from utils.label_translation import LabelTranslator, load_label_dictionary
+from utils.translator_service import translator_service
+from utils.http_client import HF_SPACE_URL, upstream
+from utils.model_manager import DETECTION_BACKEND, load_local_detector
+from utils.tracing import span
+import logging
+
+logger = logging.getLogger(__name__)
 
 # MongoDB connection (Keep if needed for language or other settings)
 client = MongoClient(config('MONGODB_URL'))
 db = client['IPDatabase']
 language_collection = db['languageSelection']
 
-# Initialize translator
-translator = Translator()
+# Detector classes are answered from the offline dictionary; other labels are
+# translated concurrently (and coalesced) on top of the shared translation cache
+label_translator = LabelTranslator(translator_service, translation_cache, dictionary=load_label_dictionary())
+
+# Detection results keyed by (upload content hash, profile). Entries hold the
+# untranslated objects so a hit only needs the per-language label translation.
+detection_cache = LRUCache(
+    max_entries=config('DETECT_CACHE_SIZE', default=512, cast=int),
+    ttl=config('DETECT_CACHE_TTL', default=600, cast=int),
+    name="detection",
+)
 
-# Translation cache (optional but recommended)
-translation_cache = {}
+# Last detected frame per user: (thumbnail, (width, height), profile, objects, profile_used).
+# Lets a phone held still reuse the previous result instead of calling upstream.
+# Thumbnails are always the same size, so the original dimensions are kept to
+# stop boxes being reused across a resolution or orientation change.
+last_frames = LRUCache(
+    max_entries=config('DETECT_DEDUP_MAX_USERS', default=1000, cast=int),
+    ttl=config('DETECT_DEDUP_TTL', default=10, cast=int),
+    name="frame_dedup",
+)
 
 class DetectionService:
     def __init__(self):
@@ -40,123 +66,178 @@ class DetectionService:
         self.font_path = "NotoSansDevanagari-VariableFont_wdth,wght.ttf"
         self.font_size = 20
         # Removed self.current_language as language is now passed per request
-        self.similarity_threshold = 0.95 # Keep if frame similarity check is used elsewhere
-        self.use_hf_api = True # Keep as it controls API usage
+        self.similarity_threshold = 0.95 # SSIM above which a user's frame counts as a repeat of their last one
+        self.use_frame_dedup = config('DETECT_FRAME_DEDUP', default=True, cast=bool)
+        self.use_hf_api = DETECTION_BACKEND != 'local' # False runs the local ONNX detector instead
 
     async def translate_text(self, text, target_language):
-        """Translates text using googletrans with caching."""
-        #print(f"[DEBUG] Attempting translation: '{text}' -> '{target_language}'") # DEBUG
-        if target_language == 'en': # No need to translate if target is English
-            #print("[DEBUG] Target is 'en', skipping translation.") # DEBUG
-            return text
-        cache_key = (text, target_language)
-        if cache_key in translation_cache:
-            #print("[DEBUG] Found in cache.") # DEBUG
-            return translation_cache[cache_key]
-        try:
-            # Directly await the translate coroutine
-            translated = await translator.translate(text, dest=target_language)
-            translated_text = translated.text
-            #print(f"[DEBUG] Translation result: '{translated_text}'") # DEBUG
-            translation_cache[cache_key] = translated_text # Cache the result
-            return translated_text
-        except Exception as e:
-            #print(f"[DEBUG] Translation error for '{text}' to {target_language}: {e}") # DEBUG
-            # Optionally log the full traceback for better error diagnosis
-            import traceback
-            traceback.print_exc()
-            return text # Return original text on error
+        """
+        Translates text, checking the offline label dictionary first and then
+        googletrans with caching. Cached translations
+        (memory, then the on-disk store) are used while fresh; a stale one is
+        refreshed, or served as-is if the translator is unreachable.
+        """
+        translated = await label_translator.translate_many([text], target_language)
+        return translated[text]
+
+    def get_cache_stats(self):
+        """Hit/miss counters for the detection result, frame dedup and translation caches."""
+        return {
+            "detection": detection_cache.stats(),
+            "frame_dedup": last_frames.stats(),
+            "translation": translation_cache.stats(),
+            "label_translation": label_translator.stats(),
+            "translator": translator_service.stats(),
+        }
+
+    def is_similar_frame(self, previous_thumb, thumb):
+        """Compare two grayscale thumbnails with SSIM against similarity_threshold."""
+        if previous_thumb is None or thumb is None or previous_thumb.shape != thumb.shape:
+            return False
+        score = ssim(previous_thumb, thumb, data_range=255)
+        return score >= self.similarity_threshold
+
+    def prepare_image(self, image_bytes, content_hash=None):
+        """Prepare raw upload bytes for the detector (JPEG pass-through when possible)."""
+        return prepare_detection_upload(image_bytes, content_hash)
+
+    def cached_detection(self, content_hash, profile):
+        """(objects, profile_used) cached for these upload bytes and profile, or None."""
+        return detection_cache.get((content_hash, profile))
+
+    async def _detect_upstream(self, prepared, profile):
+        """
+        Call the Hugging Face Spaces detector.
+        Returns (objects, profile_used) with boxes already in original image coordinates.
+        """
+        # Prepare multipart/form-data payload
+        space_url = f"{HF_SPACE_URL}/api/detect_objects"
+        form_data = aiohttp.FormData()
+        form_data.add_field('image', prepared.data, filename='image.jpg', content_type='image/jpeg')
+        # Use provided parameters or defaults
+        form_data.add_field('profile', profile)
+
+        # Call Hugging Face Spaces API with form data over the pooled session
+        async with upstream.session() as session:
+            # Send POST request with FormData
+            async with session.post(space_url, data=form_data, timeout=aiohttp.ClientTimeout(total=30)) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise Exception(f"API Error {response.status}: {error_text}")
+
+                result = await response.json()
 
-    async def detect_objects_api(self, frame, profile='kids', target_language='en', username=None): # Remove confidence and iou
-        """Detect objects in a frame using Hugging Face Spaces API and translate labels."""
+                if result.get("status") == "error":
+                    raise Exception(f"Detection error: {result.get('message')}")
+
+        api_objects = result.get("objects", [])
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("API response: %s", json.dumps(api_objects))
+        return self._normalize_objects(api_objects, prepared), result.get("profile_used", profile)
+
+    async def _detect_local(self, prepared, profile):
+        """Run the local ONNX detector on the prepared upload. Same return shape as _detect_upstream."""
+        def run():
+            detector = load_local_detector()
+            frame = cv2.imdecode(np.frombuffer(prepared.data, np.uint8), cv2.IMREAD_COLOR)
+            if frame is None:
+                raise ValueError("Could not decode image")
+            return detector.detect(frame)
+
+        api_objects = await asyncio.to_thread(run)
+        # The local model has no profile-specific class lists, so every class is reported
+        return self._normalize_objects(api_objects, prepared), profile
+
+    async def warmup(self):
+        """Warm the translation cache from disk and, in local mode, load the detector."""
+        await asyncio.to_thread(translation_cache.warm)
+        if not self.use_hf_api:
+            await asyncio.to_thread(load_local_detector)
+
+    def _normalize_objects(self, api_objects, prepared):
+        """Keep well-formed detections and map their boxes back to original image coordinates."""
+        objects = []
+        for obj in api_objects:
+            # Check if 'box' exists and is a list with 4 elements
+            if "box" in obj and isinstance(obj["box"], list) and len(obj["box"]) == 4:
+                # Box format is [x, y, width, height], mapped back to the original image size
+                x1, y1, width, height = scale_box(obj["box"], prepared)
+                centre = [x1 + width // 2, y1 + height // 2]
+                objects.append({
+                    "box": [int(x1), int(y1), int(width), int(height)], # Keep the [x, y, w, h] format
+                    "centre": centre,
+                    "label_en": obj.get("label_en") # Original English label
+                    # Confidence removed as per previous request
+                })
+            elif "box" in obj: # Log if box format is unexpected
+                print(f"[WARN] Unexpected box format received: {obj['box']}")
+        return objects
+
+    async def _translate_objects(self, objects, target_language):
+        """Return copies of the detected objects with a translated `label` added."""
+        # Translate each unique label once; cache misses are fetched concurrently
+        labels_en = [obj.get("label_en") for obj in objects]
+        with span("translate"):
+            translated_labels_map = await label_translator.translate_many(labels_en, target_language)
+
+        return [
+            dict(obj, label=translated_labels_map.get(obj.get("label_en"), obj.get("label_en")))
+            for obj in objects
+        ]
+
+    async def detect_objects_api(self, image, profile='kids', target_language='en', username=None, cached=None): # Remove confidence and iou
+        """
+        Detect objects using Hugging Face Spaces API (or the local detector) and translate labels.
+        `image` is a PreparedUpload (see prepare_image) or a decoded OpenCV frame.
+        Results for an upload already seen with the same profile come from the
+        detection cache, and a frame that is an SSIM near-duplicate of the user's
+        previous one reuses that result; only the label translation is redone.
+        Callers that already looked the upload up (see cached_detection) pass
+        the hit as `cached`, and `image` is then not used.
+        """
         try:
-            # Convert OpenCV frame to PIL Image
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            pil_image = Image.fromarray(frame_rgb)
-
-            # Convert PIL image to JPEG bytes in memory
-            buffered = io.BytesIO()
-            pil_image.save(buffered, format="JPEG", quality=95)
-            image_bytes = buffered.getvalue()
-
-            # Prepare multipart/form-data payload
-            space_url = "https://monilm-lingual.hf.space/api/detect_objects"
-            form_data = aiohttp.FormData()
-            form_data.add_field('image', image_bytes, filename='image.jpg', content_type='image/jpeg')
-            # Use provided parameters or defaults
-            form_data.add_field('profile', profile)
-
-            # Call Hugging Face Spaces API with form data
-            async with aiohttp.ClientSession() as session:
-                # Send POST request with FormData
-                async with session.post(space_url, data=form_data, timeout=30) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        raise Exception(f"API Error {response.status}: {error_text}")
-
-                    result = await response.json()
-
-                    if result.get("status") == "error":
-                        raise Exception(f"Detection error: {result.get('message')}")
-
-            # --- Optimization: Translate unique labels once ---
-            api_objects = result.get("objects", [])
-            unique_labels_en = set(obj.get("label_en") for obj in api_objects if "box" in obj)
-
-            # Translate unique labels concurrently
-            translation_tasks = {
-                label: self.translate_text(label, target_language)
-                for label in unique_labels_en
-            }
-            # Wait for all translations to complete
-            translated_labels_map = {}
-            for label, task in translation_tasks.items():
-                try:
-                    translated_labels_map[label] = await task
-                except Exception as trans_err:
-                    print(f"[WARN] Failed to translate label '{label}': {trans_err}")
-                    translated_labels_map[label] = label # Fallback to original on error
-
-            # --- End Optimization ---
-
-            # Process results using the pre-translated map
-            detections = []
-            # api_objects = result.get("objects", []) # Already defined above
-            print(f"[DEBUG] API response: {json.dumps(api_objects, indent=2)}") # DEBUG log the full response
-            for obj in api_objects:
-                # Check if 'box' exists and is a list with 4 elements
-                if "box" in obj and isinstance(obj["box"], list) and len(obj["box"]) == 4:
-                    # Box format is [x, y, width, height]
-                    x1 = obj["box"][0]
-                    y1 = obj["box"][1]
-                    width = obj["box"][2]
-                    height = obj["box"][3]
-                    x2 = x1 + width # Calculate x2
-                    y2 = y1 + height # Calculate y2
-
-                    label_en = obj.get("label_en") # Assuming class_name is still the key for the label
-
-                    # Get the translated label from the map
-                    translated_label = translated_labels_map.get(label_en, label_en) # Use map, fallback to original
-
-                    centre = [x1 + width // 2, y1 + height // 2]
-
-                    detections.append({
-                        "box": [int(x1), int(y1), int(width), int(height)], # Keep the [x, y, w, h] format
-                        "centre": centre,
-                        "label_en": label_en, # Original English label
-                        "label": translated_label # Potentially translated label
-                        # Confidence removed as per previous request
-                    })
-                elif "box" in obj: # Log if box format is unexpected
-                    print(f"[WARN] Unexpected box format received: {obj['box']}")
+            if cached is None:
+                if isinstance(image, PreparedUpload):
+                    prepared = image
+                else:
+                    # Decoded frame - encode it ourselves
+                    with span("encode"):
+                        prepared = await asyncio.to_thread(encode_frame, image)
+
+                cache_key = (prepared.content_hash, profile) if prepared.content_hash else None
+                cached = detection_cache.get(cache_key) if cache_key else None
+
+            # Near-duplicate of this user's previous frame? Reuse its result.
+            thumb = None
+            previous = None
+            if cached is None and username and self.use_frame_dedup:
+                with span("dedup"):
+                    thumb = await asyncio.to_thread(make_thumbnail, prepared.data)
+                    previous = last_frames.get(username)
+                    if (previous and previous[1] == (prepared.width, prepared.height) and previous[2] == profile
+                            and await asyncio.to_thread(self.is_similar_frame, previous[0], thumb)):
+                        cached = (previous[3], previous[4])
+
+            if cached is not None:
+                objects, profile_used = cached
+            else:
+                detect = self._detect_upstream if self.use_hf_api else self._detect_local
+                with span("detect_upstream" if self.use_hf_api else "detect_local"):
+                    objects, profile_used = await detect(prepared, profile)
+                if cache_key:
+                    detection_cache.set(cache_key, (objects, profile_used))
+                if thumb is not None:
+                    # Only frames that went upstream become the reference, so slow
+                    # camera drift still triggers a fresh detection eventually
+                    last_frames.set(username, (thumb, (prepared.width, prepared.height), profile, objects, profile_used))
 
+            detections = await self._translate_objects(objects, target_language)
 
             # Construct the final response structure (similar to your original format)
             final_response = {
                 "objects": detections,
                 "count": len(detections),
-                "profile_used": result.get("profile_used", profile),
+                "profile_used": profile_used,
                 # "classes_used": result.get("classes_used", []), # Pass through from API if available
                 "status": "success",
                 "message": None,
@@ -0,0 +1,66 @@
+"""
+Process-wide pooled aiohttp session for calls to the Hugging Face Space.
+
+The session is opened on Hypercorn's event loop at ASGI lifespan startup and
+closed at shutdown, so every upstream call made from the native async views
+reuses the same connection pool, keep-alive connections and DNS cache.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+import aiohttp
+from decouple import config
+
+HF_SPACE_URL = config('HF_SPACE_URL', default='https://monilm-lingual.hf.space')
+
+# Connection pool settings
+POOL_LIMIT = config('UPSTREAM_POOL_LIMIT', default=100, cast=int)
+POOL_LIMIT_PER_HOST = config('UPSTREAM_POOL_LIMIT_PER_HOST', default=50, cast=int)
+DNS_CACHE_TTL = config('UPSTREAM_DNS_CACHE_TTL', default=300, cast=int)
+KEEPALIVE_TIMEOUT = config('UPSTREAM_KEEPALIVE_TIMEOUT', default=60, cast=int)
+
+
+class UpstreamClient:
+    """Owns the shared aiohttp session and remembers the event loop it is bound to."""
+
+    def __init__(self):
+        self._session = None
+        self._loop = None
+
+    async def startup(self):
+        """Open the pooled session on the running (server) event loop."""
+        if self._session is not None:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=POOL_LIMIT,
+            limit_per_host=POOL_LIMIT_PER_HOST,
+            ttl_dns_cache=DNS_CACHE_TTL,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+        )
+        self._session = aiohttp.ClientSession(connector=connector)
+        self._loop = asyncio.get_running_loop()
+        print(f"Upstream client started (pool limit {POOL_LIMIT}, per host {POOL_LIMIT_PER_HOST})")
+
+    async def shutdown(self):
+        """Close the pooled session and its connections."""
+        if self._session is None:
+            return
+        await self._session.close()
+        self._session = None
+        self._loop = None
+        print("Upstream client stopped")
+
+    @asynccontextmanager
+    async def session(self):
+        """
+        Yield the pooled session when running on the server loop, otherwise
+        (scripts, Flask dev server) a short-lived session for this call only.
+        """
+        if self._session is not None and asyncio.get_running_loop() is self._loop:
+            yield self._session
+            return
+        async with aiohttp.ClientSession() as session:
+            yield session
+
+
+# Create global client instance
+upstream = UpstreamClient()
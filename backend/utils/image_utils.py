@@ -0,0 +1,265 @@
+"""
+Helpers for preparing camera uploads before they are sent to the detector.
+
+Most uploads from the app are already JPEGs, so we read just enough of the
+header to decide whether the bytes can be forwarded untouched. Anything else
+(other formats, rotated EXIF, CMYK, oversize frames) is decoded, downscaled to
+DETECT_MAX_UPLOAD_DIMENSION and re-encoded within DETECT_MAX_UPLOAD_BYTES.
+Boxes returned by the detector are mapped back with scale_box.
+"""
+import hashlib
+import struct
+import cv2
+import numpy as np
+from decouple import config
+
+# Largest edge (in pixels) sent to the detector - bigger frames are downscaled first
+MAX_UPLOAD_DIMENSION = config('DETECT_MAX_UPLOAD_DIMENSION', default=1280, cast=int)
+# Upload size budget in bytes - JPEG quality is lowered until the frame fits
+MAX_UPLOAD_BYTES = config('DETECT_MAX_UPLOAD_BYTES', default=300 * 1024, cast=int)
+# Qualities tried in order when re-encoding, highest first
+JPEG_QUALITY_STEPS = (90, 80, 70, 60, 50)
+# How often we shrink the frame further if even the lowest quality is over budget
+MAX_BUDGET_SHRINKS = 3
+
+# OpenCV reduced-resolution decode modes (JPEG decodes these in the DCT domain)
+REDUCED_DECODE_MODES = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+# EXIF orientations that swap width and height
+TRANSPOSING_ORIENTATIONS = (5, 6, 7, 8)
+# Edge length of the grayscale thumbnails used for frame similarity checks
+THUMBNAIL_SIZE = 64
+
+# Start-of-frame markers we can pass through (baseline, extended sequential, progressive)
+PASSTHROUGH_SOF_MARKERS = (0xC0, 0xC1, 0xC2)
+# Every SOFn marker - C4 (DHT), C8 (JPG) and CC (DAC) share the range but are not frames
+SOF_MARKERS = tuple(m for m in range(0xC0, 0xD0) if m not in (0xC4, 0xC8, 0xCC))
+# Markers that carry no length field
+STANDALONE_MARKERS = tuple(range(0xD0, 0xD8)) + (0x01,)
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+EXIF_ORIENTATION_TAG = 0x0112
+
+
+class ImageInfo:
+    """Header-level description of an encoded image."""
+
+    def __init__(self, format, width=0, height=0, components=None, orientation=None, sof_marker=None):
+        self.format = format
+        self.width = width
+        self.height = height
+        self.components = components
+        self.orientation = orientation
+        self.sof_marker = sof_marker
+
+    def __repr__(self):
+        return (f"ImageInfo(format={self.format!r}, width={self.width}, height={self.height}, "
+                f"components={self.components}, orientation={self.orientation})")
+
+
+class PreparedUpload:
+    """JPEG bytes ready for the detector plus the factors that map boxes back to the original image."""
+
+    def __init__(self, data, width, height, scale_x=1.0, scale_y=1.0, passthrough=False, content_hash=None):
+        self.data = data
+        self.width = width
+        self.height = height
+        self.scale_x = scale_x
+        self.scale_y = scale_y
+        self.passthrough = passthrough
+        # Digest of the original upload bytes, used as a cache key
+        self.content_hash = content_hash
+
+    @property
+    def resized(self):
+        return self.scale_x != 1.0 or self.scale_y != 1.0
+
+
+def _read_exif_orientation(segment):
+    """Return the EXIF orientation stored in an APP1 payload, or None."""
+    if not segment.startswith(b'Exif\x00\x00'):
+        return None
+    tiff = segment[6:]
+    if len(tiff) < 8:
+        return None
+    if tiff[:2] == b'II':
+        endian = '<'
+    elif tiff[:2] == b'MM':
+        endian = '>'
+    else:
+        return None
+    ifd_offset = struct.unpack(endian + 'I', tiff[4:8])[0]
+    if ifd_offset + 2 > len(tiff):
+        return None
+    entry_count = struct.unpack(endian + 'H', tiff[ifd_offset:ifd_offset + 2])[0]
+    for i in range(entry_count):
+        entry = ifd_offset + 2 + i * 12
+        if entry + 12 > len(tiff):
+            break
+        tag, value_type = struct.unpack(endian + 'HH', tiff[entry:entry + 4])
+        if tag == EXIF_ORIENTATION_TAG and value_type == 3:  # SHORT, stored inline
+            return struct.unpack(endian + 'H', tiff[entry + 8:entry + 10])[0]
+    return None
+
+
+def _sniff_jpeg(data):
+    info = ImageInfo('jpeg')
+    pos = 2
+    length = len(data)
+    while pos + 4 <= length:
+        if data[pos] != 0xFF:
+            return None  # Corrupt marker stream
+        marker = data[pos + 1]
+        if marker == 0xFF:  # Fill byte
+            pos += 1
+            continue
+        if marker in STANDALONE_MARKERS:
+            pos += 2
+            continue
+        segment_length = struct.unpack('>H', data[pos + 2:pos + 4])[0]
+        segment = data[pos + 4:pos + 2 + segment_length]
+        if marker == 0xE1 and info.orientation is None:
+            info.orientation = _read_exif_orientation(segment)
+        elif marker in SOF_MARKERS:
+            if len(segment) < 6:
+                return None
+            info.height, info.width = struct.unpack('>HH', segment[1:5])
+            info.components = segment[5]
+            info.sof_marker = marker
+            return info  # Everything we need appears before the frame header
+        elif marker == 0xDA:  # Start of scan without a frame header
+            return None
+        pos += 2 + segment_length
+    return None
+
+
+def sniff_image(data):
+    """Read format and dimensions from the image header without decoding pixels."""
+    if data[:2] == b'\xff\xd8':
+        return _sniff_jpeg(data) or ImageInfo('unknown')
+    if data[:8] == PNG_SIGNATURE and data[12:16] == b'IHDR':
+        width, height = struct.unpack('>II', data[16:24])
+        return ImageInfo('png', width, height)
+    return ImageInfo('unknown')
+
+
+def can_pass_through(info, size):
+    """Whether a sniffed image of `size` bytes can be forwarded to the detector as-is."""
+    return (
+        info.format == 'jpeg'
+        and size <= MAX_UPLOAD_BYTES
+        and info.sof_marker in PASSTHROUGH_SOF_MARKERS
+        and info.components in (1, 3)
+        and info.orientation in (None, 1)
+        and 0 < info.width <= MAX_UPLOAD_DIMENSION
+        and 0 < info.height <= MAX_UPLOAD_DIMENSION
+    )
+
+
+def _encode_within_budget(frame, max_bytes):
+    """JPEG-encode a frame at the highest quality step that fits max_bytes."""
+    for _ in range(MAX_BUDGET_SHRINKS + 1):
+        for quality in JPEG_QUALITY_STEPS:
+            ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            if not ok:
+                raise ValueError("Could not encode image")
+            if encoded.nbytes <= max_bytes:
+                return frame, encoded
+        # Still too big at the lowest quality - shrink and try again
+        height, width = frame.shape[:2]
+        frame = cv2.resize(frame, (max(1, width * 3 // 4), max(1, height * 3 // 4)), interpolation=cv2.INTER_AREA)
+    return frame, encoded
+
+
+def encode_frame(frame, original_size=None, max_dimension=MAX_UPLOAD_DIMENSION, max_bytes=MAX_UPLOAD_BYTES):
+    """
+    Downscale a BGR frame to max_dimension and JPEG-encode it within max_bytes.
+    `original_size` is the (width, height) boxes should be mapped back to; it
+    defaults to the frame size and differs when the frame came from a reduced decode.
+    """
+    height, width = frame.shape[:2]
+    original_width, original_height = original_size or (width, height)
+    scale = min(1.0, max_dimension / float(max(width, height)))
+    if scale < 1.0:
+        new_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        frame = cv2.resize(frame, new_size, interpolation=cv2.INTER_AREA)
+    frame, encoded = _encode_within_budget(frame, max_bytes)
+    sent_height, sent_width = frame.shape[:2]
+    return PreparedUpload(
+        encoded.tobytes(),
+        original_width,
+        original_height,
+        scale_x=original_width / float(sent_width),
+        scale_y=original_height / float(sent_height),
+    )
+
+
+def _decode_mode(info, max_dimension):
+    """Pick the cheapest OpenCV decode mode that still yields at least max_dimension pixels on the long edge."""
+    if info.format == 'jpeg' and info.width and info.height:
+        long_edge = max(info.width, info.height)
+        for factor, mode in REDUCED_DECODE_MODES:
+            if long_edge // factor >= max_dimension:
+                return mode
+    return cv2.IMREAD_COLOR
+
+
+def upload_digest(image_bytes):
+    """Digest of raw upload bytes, used as the detection cache key."""
+    return hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
+
+
+def prepare_detection_upload(image_bytes, content_hash=None):
+    """
+    Turn raw upload bytes into a PreparedUpload for the detector.
+    Acceptable JPEGs within the size limits are forwarded untouched; everything
+    else is decoded (at reduced resolution when the frame is much larger than
+    needed - OpenCV applies the EXIF orientation), downscaled and re-encoded.
+    Raises ValueError if the bytes cannot be decoded.
+    """
+    content_hash = content_hash or upload_digest(image_bytes)
+    info = sniff_image(image_bytes)
+    if can_pass_through(info, len(image_bytes)):
+        return PreparedUpload(image_bytes, info.width, info.height, passthrough=True, content_hash=content_hash)
+
+    frame = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), _decode_mode(info, MAX_UPLOAD_DIMENSION))
+    if frame is None:
+        raise ValueError("Could not decode image")
+
+    original_size = None
+    if info.width and info.height:
+        # Boxes must map back to the full-resolution, correctly oriented image
+        if info.orientation in TRANSPOSING_ORIENTATIONS:
+            original_size = (info.height, info.width)
+        else:
+            original_size = (info.width, info.height)
+    prepared = encode_frame(frame, original_size=original_size)
+    prepared.content_hash = content_hash
+    return prepared
+
+
+def scale_box(box, prepared):
+    """Map an [x, y, w, h] box from the uploaded image back to original image coordinates."""
+    x, y, w, h = box
+    if not prepared.resized:
+        return [x, y, w, h]
+    return [
+        int(round(x * prepared.scale_x)),
+        int(round(y * prepared.scale_y)),
+        int(round(w * prepared.scale_x)),
+        int(round(h * prepared.scale_y)),
+    ]
+
+
+def make_thumbnail(jpeg_bytes, size=THUMBNAIL_SIZE):
+    """
+    Decode an (already downscaled) JPEG at 1/8 resolution straight to grayscale
+    and resize it to a size x size thumbnail. Returns None if decoding fails.
+    """
+    thumb = cv2.imdecode(np.frombuffer(jpeg_bytes, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if thumb is None:
+        return None
+    return cv2.resize(thumb, (size, size), interpolation=cv2.INTER_AREA)
@@ -0,0 +1,247 @@
+"""
+Batched label translation for detection responses.
+
+All labels of a response are translated together. Detector classes come
+from the precompiled offline dictionary (see build_label_dictionary.py) and
+other cached labels from the translation cache. The rest are fetched
+concurrently, with at most TRANSLATE_CONCURRENCY upstream calls at once. A (text, language) pair that
+another request is already fetching is awaited rather than requested again,
+and short labels are packed into one newline-joined upstream call.
+"""
+import asyncio
+import json
+import os
+import weakref
+from decouple import config
+
+TRANSLATE_CONCURRENCY = config('TRANSLATE_CONCURRENCY', default=8, cast=int)
+# Labels per packed upstream call (1 disables packing)
+TRANSLATE_PACK_SIZE = config('TRANSLATE_PACK_SIZE', default=16, cast=int)
+TRANSLATE_PACK_MAX_CHARS = config('TRANSLATE_PACK_MAX_CHARS', default=500, cast=int)
+PACK_SEPARATOR = "\n"
+LABEL_DICTIONARY_PATH = config(
+    'LABEL_DICTIONARY_PATH',
+    default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'labels', 'label_translations.json'),
+)
+
+
+def load_label_dictionary(path=LABEL_DICTIONARY_PATH):
+    """Load the offline label table as {(label, lang): translation}. Missing file -> empty table."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        print(f"[WARN] Label dictionary not found at {path}; all labels will be translated online")
+        return {}
+    except json.JSONDecodeError as e:
+        print(f"[WARN] Could not parse label dictionary {path}: {e}")
+        return {}
+    table = {}
+    for label, translations in data.get("labels", {}).items():
+        for lang, translated in translations.items():
+            if translated:
+                table[(label.lower(), lang)] = translated
+    return table
+
+
+class _LoopState:
+    """Concurrency slots and in-flight table (asyncio primitives belong to one event loop)."""
+
+    def __init__(self, concurrency):
+        self.slots = asyncio.Semaphore(concurrency)
+        self.inflight = {}  # (text, lang) -> Future with the translation, or None on failure
+
+
+class LabelTranslator:
+    """Translates sets of labels through a googletrans-style translator and a TranslationCache."""
+
+    def __init__(self, translator, cache, dictionary=None, concurrency=TRANSLATE_CONCURRENCY,
+                 pack_size=TRANSLATE_PACK_SIZE, pack_max_chars=TRANSLATE_PACK_MAX_CHARS):
+        self.translator = translator
+        self.cache = cache
+        self.dictionary = dictionary or {}  # (label, lang) -> translation, see load_label_dictionary
+        self.concurrency = concurrency
+        self.pack_size = pack_size
+        self.pack_max_chars = pack_max_chars
+        self._states = weakref.WeakKeyDictionary()  # event loop -> _LoopState
+        self.dictionary_hits = 0
+        self.upstream_calls = 0
+        self.packed_calls = 0
+        self.pack_fallbacks = 0
+        self.coalesced = 0
+
+    def _state(self):
+        loop = asyncio.get_running_loop()
+        state = self._states.get(loop)
+        if state is None:
+            state = self._states[loop] = _LoopState(self.concurrency)
+        return state
+
+    async def translate_many(self, texts, lang):
+        """
+        Translate texts into lang and return {text: translation}. A label that
+        cannot be translated falls back to a stale cached copy, else to itself.
+        """
+        texts = list(dict.fromkeys(texts))
+        if lang == 'en':
+            return {text: text for text in texts}
+        results = {text: text for text in texts if not isinstance(text, str) or not text}
+        for text in texts:
+            if text not in results:
+                translated = self.dictionary.get((text.lower(), lang))
+                if translated is not None:
+                    results[text] = translated
+                    self.dictionary_hits += 1
+        texts = [text for text in texts if text not in results]
+        if not texts:
+            return results
+
+        cached = {}
+        missing = []
+        for text in texts:
+            entry = self.cache.peek(text, lang)
+            if entry is None:
+                missing.append(text)
+            else:
+                cached[text] = entry
+        if missing:
+            # Memory misses go to the on-disk store in one trip off the loop
+            cached.update(await asyncio.to_thread(self._load, missing, lang))
+
+        to_fetch = []
+        for text in texts:
+            entry = cached.get(text)
+            if entry is not None and self.cache.is_fresh(entry):
+                results[text] = entry[0]
+            else:
+                to_fetch.append(text)
+
+        if to_fetch:
+            fetched = await self._fetch_coalesced(to_fetch, lang)
+            for text in to_fetch:
+                translated = fetched.get(text)
+                if translated is None:
+                    stale = cached.get(text)
+                    if stale is not None:
+                        # Translator unreachable - an old translation beats the English label
+                        self.cache.record_stale()
+                        translated = stale[0]
+                    else:
+                        translated = text
+                results[text] = translated
+        return results
+
+    def _load(self, texts, lang):
+        found = {}
+        for text in texts:
+            entry = self.cache.load(text, lang)
+            if entry is not None:
+                found[text] = entry
+        return found
+
+    async def _fetch_coalesced(self, texts, lang):
+        """Join fetches already in flight and start the rest. Returns {text: translation or None}."""
+        state = self._state()
+        loop = asyncio.get_running_loop()
+        joined, owned = {}, {}
+        for text in texts:
+            key = (text, lang)
+            future = state.inflight.get(key)
+            if future is not None:
+                joined[text] = future
+                self.coalesced += 1
+            else:
+                owned[text] = state.inflight[key] = loop.create_future()
+
+        fetched = {}
+        try:
+            if owned:
+                fetched = await self._fetch(list(owned), lang)
+        finally:
+            # Always settle our futures (even when cancelled) so joined requests never hang
+            for text, future in owned.items():
+                state.inflight.pop((text, lang), None)
+                if not future.done():
+                    future.set_result(fetched.get(text))
+
+        results = dict(fetched)
+        for text, future in joined.items():
+            # shield: a cancelled waiter must not cancel the shared future
+            results[text] = await asyncio.shield(future)
+        return results
+
+    async def _fetch(self, texts, lang):
+        """Fetch translations concurrently, packing short labels. Returns {text: translation} for successes."""
+        singles = []
+        batches = []
+        if self.pack_size > 1:
+            batch, chars = [], 0
+            for text in texts:
+                if PACK_SEPARATOR in text:
+                    singles.append(text)
+                    continue
+                if batch and (len(batch) >= self.pack_size or chars + len(text) > self.pack_max_chars):
+                    batches.append(batch)
+                    batch, chars = [], 0
+                batch.append(text)
+                chars += len(text) + 1
+            if batch:
+                batches.append(batch)
+            singles.extend(batch[0] for batch in batches if len(batch) == 1)
+            batches = [batch for batch in batches if len(batch) > 1]
+        else:
+            singles = list(texts)
+
+        outcomes = await asyncio.gather(
+            *(self._fetch_packed(batch, lang) for batch in batches),
+            *(self._fetch_one(text, lang) for text in singles),
+        )
+        results = {}
+        for outcome in outcomes:
+            results.update(outcome)
+        if results:
+            await asyncio.to_thread(self.cache.store_many, lang, results)
+        return results
+
+    async def _call(self, text, lang):
+        async with self._state().slots:
+            self.upstream_calls += 1
+            translated = await self.translator.translate(text, dest=lang)
+            return translated.text
+
+    async def _fetch_one(self, text, lang):
+        try:
+            return {text: await self._call(text, lang)}
+        except Exception as e:
+            print(f"[WARN] Failed to translate label '{text}': {e}")
+            return {}
+
+    async def _fetch_packed(self, batch, lang):
+        try:
+            translated = await self._call(PACK_SEPARATOR.join(batch), lang)
+        except Exception as e:
+            # Upstream failure, not a packing problem - don't retry label by label
+            print(f"[WARN] Failed to translate {len(batch)} packed labels: {e}")
+            return {}
+        self.packed_calls += 1
+        parts = [part.strip() for part in translated.split(PACK_SEPARATOR)]
+        if len(parts) == len(batch) and all(parts):
+            return dict(zip(batch, parts))
+        # Translator merged or dropped lines - fall back to one call per label
+        self.pack_fallbacks += 1
+        results = {}
+        for outcome in await asyncio.gather(*(self._fetch_one(text, lang) for text in batch)):
+            results.update(outcome)
+        return results
+
+    def stats(self):
+        return {
+            "dictionary_entries": len(self.dictionary),
+            "dictionary_hits": self.dictionary_hits,
+            "upstream_calls": self.upstream_calls,
+            "packed_calls": self.packed_calls,
+            "pack_fallbacks": self.pack_fallbacks,
+            "coalesced": self.coalesced,
+            "concurrency": self.concurrency,
+            "pack_size": self.pack_size,
+        }
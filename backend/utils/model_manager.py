@@ -1,13 +1,56 @@
 import os
+import hashlib
+import json
 # import torch  # Commented out for API-only mode
 # from ultralytics import YOLO  # Commented out for API-only mode
 import requests
 from pathlib import Path
 from tqdm import tqdm
 import gc
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from decouple import config
 
-# Dictionary to cache loaded models
-_models_cache = {}
+try:
+    import psutil
+except ImportError:  # Fall back to model-reported sizes only
+    psutil = None
+
+try:
+    import torch
+except ImportError:  # Only needed to release GPU memory for torch models
+    torch = None
+
+# "api" sends frames to the HF Space, "local" runs an ONNX YOLO model on this machine's CPU
+DETECTION_BACKEND = config('DETECTION_BACKEND', default='api')
+LOCAL_MODEL = config('LOCAL_DETECTOR_MODEL', default='yolov8n.onnx')
+LOCAL_INPUT_SIZE = config('LOCAL_DETECTOR_INPUT_SIZE', default=640, cast=int)
+LOCAL_NUM_THREADS = config('LOCAL_DETECTOR_THREADS', default=2, cast=int)
+LOCAL_CONF_THRESHOLD = config('LOCAL_DETECTOR_CONFIDENCE', default=0.35, cast=float)
+LOCAL_IOU_THRESHOLD = config('LOCAL_DETECTOR_IOU', default=0.45, cast=float)
+LOCAL_WARMUP_RUNS = config('LOCAL_DETECTOR_WARMUP_RUNS', default=2, cast=int)
+
+# Resident memory all loaded models may use together before LRU eviction kicks in
+MODEL_MEMORY_BUDGET_MB = config('MODEL_MEMORY_BUDGET_MB', default=1024, cast=int)
+
+# Class vocabulary of the COCO-trained YOLO models (same labels the HF Space returns)
+COCO_CLASSES = [
+    "person", "bicycle", "car", "motorcycle", "airplane", "bus", "train", "truck", "boat",
+    "traffic light", "fire hydrant", "stop sign", "parking meter", "bench", "bird", "cat",
+    "dog", "horse", "sheep", "cow", "elephant", "bear", "zebra", "giraffe", "backpack",
+    "umbrella", "handbag", "tie", "suitcase", "frisbee", "skis", "snowboard", "sports ball",
+    "kite", "baseball bat", "baseball glove", "skateboard", "surfboard", "tennis racket",
+    "bottle", "wine glass", "cup", "fork", "knife", "spoon", "bowl", "banana", "apple",
+    "sandwich", "orange", "broccoli", "carrot", "hot dog", "pizza", "donut", "cake", "chair",
+    "couch", "potted plant", "bed", "dining table", "toilet", "tv", "laptop", "mouse",
+    "remote", "keyboard", "cell phone", "microwave", "oven", "toaster", "sink",
+    "refrigerator", "book", "clock", "vase", "scissors", "teddy bear", "hair drier",
+    "toothbrush",
+]
 
 # Set up paths - prioritize the root directory where yolov12l.pt already exists
 ROOT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
@@ -17,57 +60,307 @@ DEFAULT_MODEL = "yolov12l.pt"  # Use your existing YOLOv12l.pt
 # Make sure the model directory exists
 os.makedirs(MODEL_DIRECTORY, exist_ok=True)
 
+# Optional per-model download URL, SHA-256 and size
+MODEL_MANIFEST_PATH = os.path.join(MODEL_DIRECTORY, "manifest.json")
+MODEL_DOWNLOAD_BASE_URL = config('MODEL_DOWNLOAD_BASE_URL', default='https://github.com/ultralytics/assets/releases/download/v0.0.0')
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_SEGMENT_SIZE = 8 * 1024 * 1024
+DOWNLOAD_WORKERS = config('MODEL_DOWNLOAD_WORKERS', default=4, cast=int)
+DOWNLOAD_TIMEOUT = 60
+
+def _process_rss():
+    return psutil.Process().memory_info().rss if psutil else 0
+
+
+class ModelRegistry:
+    """
+    Loaded models with a memory budget and LRU eviction.
+    Models load lazily on first use; a per-model lock makes concurrent
+    requests for the same model wait for a single load instead of racing.
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self._models = OrderedDict()  # name -> entry dict, least recently used first
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _touch(self, name):
+        entry = self._models[name]
+        entry["hits"] += 1
+        entry["last_used"] = time.time()
+        self._models.move_to_end(name)
+        self.hits += 1
+        return entry["model"]
+
+    def get(self, name, loader):
+        """Return the model called name, loading it with loader() if needed."""
+        with self._lock:
+            if name in self._models:
+                return self._touch(name)
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                if name in self._models:  # Loaded by another request while we waited
+                    return self._touch(name)
+
+            rss_before = _process_rss()
+            model = loader()
+            # RSS growth during the load, or the model's own estimate if larger
+            size = max(_process_rss() - rss_before, getattr(model, "memory_bytes", 0))
+
+            with self._lock:
+                self.misses += 1
+                self._models[name] = {
+                    "model": model,
+                    "size": size,
+                    "loaded_at": time.time(),
+                    "last_used": time.time(),
+                    "hits": 0,
+                }
+                evicted = self._evict_over_budget(keep=name)
+        for victim in evicted:
+            print(f"Evicted model {victim} to stay within {self.budget_bytes // (1024 * 1024)} MB budget")
+        if evicted:
+            gc.collect()
+        return model
+
+    def _evict_over_budget(self, keep):
+        evicted = []
+        while self.memory_bytes() > self.budget_bytes:
+            victim = next((name for name in self._models if name != keep), None)
+            if victim is None:
+                print(f"Warning: model {keep} alone exceeds the model memory budget")
+                break
+            del self._models[victim]
+            self.evictions += 1
+            evicted.append(victim)
+        return evicted
+
+    def unload(self, name):
+        with self._lock:
+            return self._models.pop(name, None) is not None
+
+    def memory_bytes(self):
+        return sum(entry["size"] for entry in self._models.values())
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "models": [
+                    {
+                        "name": name,
+                        "memory_mb": round(entry["size"] / (1024 * 1024), 1),
+                        "hits": entry["hits"],
+                        "loaded_at": entry["loaded_at"],
+                        "last_used": entry["last_used"],
+                    }
+                    for name, entry in self._models.items()
+                ],
+                "memory_mb": round(self.memory_bytes() / (1024 * 1024), 1),
+                "budget_mb": round(self.budget_bytes / (1024 * 1024), 1),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# Registry of loaded models
+model_registry = ModelRegistry(MODEL_MEMORY_BUDGET_MB * 1024 * 1024)
+
+def _load_manifest():
+    """
+    Read models/manifest.json: {"<model file>": {"url": ..., "sha256": ..., "size": ...}}.
+    Every field is optional.
+    """
+    try:
+        with open(MODEL_MANIFEST_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except json.JSONDecodeError as e:
+        print(f"Warning: could not parse model manifest {MODEL_MANIFEST_PATH}: {e}")
+        return {}
+
 def get_model_path(model_name):
     """Find the model path checking both root and model directories"""
-    # First check if model exists in the root directory (where the user has it)
-    root_model_path = os.path.join(ROOT_DIRECTORY, model_name)
-    if os.path.exists(root_model_path):
-        return root_model_path
-        
-    # Then check models directory
-    models_dir_path = os.path.join(MODEL_DIRECTORY, model_name)
-    if os.path.exists(models_dir_path):
-        return models_dir_path
-        
+    # A file whose size disagrees with the manifest is a leftover partial download
+    expected_size = _load_manifest().get(model_name, {}).get("size")
+    for candidate in (os.path.join(ROOT_DIRECTORY, model_name), os.path.join(MODEL_DIRECTORY, model_name)):
+        # First the root directory (where the user has it), then the models directory
+        if not os.path.exists(candidate):
+            continue
+        if expected_size is not None and os.path.getsize(candidate) != expected_size:
+            print(f"Ignoring {candidate}: size {os.path.getsize(candidate)} != expected {expected_size}")
+            continue
+        return candidate
+    return None
+
+def sha256_file(path):
+    """SHA-256 hex digest of a file, read in large chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _model_url(model_name, manifest_entry):
+    if manifest_entry.get("url"):
+        return manifest_entry["url"]
+    # YOLOv8 and YOLOv5 models can be downloaded from Ultralytics
+    if model_name.startswith(("yolov8", "yolov5")):
+        return f"{MODEL_DOWNLOAD_BASE_URL}/{model_name}"
     return None
 
-def download_model(model_name):
-    """Download YOLOv8 model if it doesn't exist"""
+def _probe_download(url):
+    """
+    Return (final_url, size, supports_ranges) for a download URL. Hosts that
+    reject HEAD (405, 403, ...) are probed with a one-byte ranged GET instead.
+    """
+    response = requests.head(url, allow_redirects=True, timeout=DOWNLOAD_TIMEOUT)
+    if response.ok:
+        size = int(response.headers.get('content-length', 0))
+        supports_ranges = response.headers.get('accept-ranges', '').lower() == 'bytes'
+        return response.url, size, supports_ranges
+
+    with requests.get(url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+        response.raise_for_status()
+        if response.status_code == 206:
+            # Content-Range: bytes 0-0/<total>
+            total = response.headers.get('content-range', '').rpartition('/')[2]
+            size = int(total) if total.isdigit() else 0
+            return response.url, size, size > 0
+        return response.url, int(response.headers.get('content-length', 0)), False
+
+def _save_download_state(state_path, state):
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_path)
+
+def _download_segment(url, part_path, start, end, progress_bar):
+    """Fetch bytes start..end (inclusive) with an HTTP Range request into part_path."""
+    headers = {'Range': f'bytes={start}-{end}'}
+    with requests.get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+        if response.status_code != 206:
+            raise IOError(f"Server ignored range request (HTTP {response.status_code})")
+        with open(part_path, 'r+b') as f:
+            f.seek(start)
+            written = 0
+            for data in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                f.write(data)
+                written += len(data)
+                progress_bar.update(len(data))
+    if written != end - start + 1:
+        raise IOError(f"Segment {start}-{end} truncated ({written} bytes)")
+
+def _download_ranged(url, part_path, size, workers):
+    """
+    Parallel download in fixed-size segments. Finished segments are recorded in a
+    sidecar state file so an interrupted download resumes where it stopped.
+    """
+    state_path = part_path + ".state"
+    segments = [(start, min(start + DOWNLOAD_SEGMENT_SIZE, size) - 1) for start in range(0, size, DOWNLOAD_SEGMENT_SIZE)]
+    state = {"url": url, "size": size, "done": []}
+    if os.path.exists(state_path) and os.path.exists(part_path) and os.path.getsize(part_path) == size:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        if saved.get("size") == size:
+            state["done"] = saved.get("done", [])
+            print(f"Resuming download: {len(state['done'])}/{len(segments)} segments already present")
+    else:
+        with open(part_path, 'wb') as f:
+            f.truncate(size)  # Preallocate so workers can write their ranges in place
+        _save_download_state(state_path, state)
+
+    done = set(state["done"])
+    pending = [i for i in range(len(segments)) if i not in done]
+    state_lock = threading.Lock()
+    progress_bar = tqdm(total=size, initial=sum(segments[i][1] - segments[i][0] + 1 for i in done),
+                        unit='iB', unit_scale=True)
+
+    def fetch(index):
+        start, end = segments[index]
+        _download_segment(url, part_path, start, end, progress_bar)
+        with state_lock:
+            state["done"].append(index)
+            _save_download_state(state_path, state)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for future in [pool.submit(fetch, i) for i in pending]:
+                future.result()
+    finally:
+        progress_bar.close()
+    os.remove(state_path)
+
+def _download_stream(url, part_path):
+    """Plain streamed download for servers without range support (no resume)."""
+    with requests.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+        response.raise_for_status()
+        total_size = int(response.headers.get('content-length', 0))
+        progress_bar = tqdm(total=total_size, unit='iB', unit_scale=True)
+        with open(part_path, 'wb') as file:
+            for data in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                progress_bar.update(len(data))
+                file.write(data)
+        progress_bar.close()
+
+def fetch_file(url, dest_path, sha256=None, workers=None):
+    """
+    Download url to dest_path via a .part file: parallel HTTP Range segments with
+    resume when the server supports them, SHA-256 verification when a digest is
+    given, then an atomic rename so dest_path is never a partial file.
+    """
+    workers = DOWNLOAD_WORKERS if workers is None else workers
+    part_path = dest_path + ".part"
+    final_url, size, supports_ranges = _probe_download(url)
+    if supports_ranges and size > 0:
+        _download_ranged(final_url, part_path, size, workers)
+    else:
+        _download_stream(final_url, part_path)
+
+    if sha256:
+        actual = sha256_file(part_path)
+        if actual != sha256.lower():
+            os.remove(part_path)
+            raise ValueError(f"Checksum mismatch for {os.path.basename(dest_path)}: expected {sha256}, got {actual}")
+    os.replace(part_path, dest_path)
+    return dest_path
+
+def download_model(model_name, url=None, sha256=None):
+    """Download a model into MODEL_DIRECTORY if it doesn't exist"""
     # Check if model already exists in any location
     existing_path = get_model_path(model_name)
     if existing_path:
         print(f"Model {model_name} already exists at {existing_path}")
         return existing_path
-        
+
+    manifest_entry = _load_manifest().get(model_name, {})
+    url = url or _model_url(model_name, manifest_entry)
+    sha256 = sha256 or manifest_entry.get("sha256")
+    if not url:
+        if model_name == DEFAULT_MODEL:
+            raise FileNotFoundError(f"Default model {DEFAULT_MODEL} is missing and has no download URL")
+        print(f"Model {model_name} not recognized. Using default model {DEFAULT_MODEL}")
+        return get_model_path(DEFAULT_MODEL) or download_model(DEFAULT_MODEL)
+    if not sha256:
+        print(f"Warning: no SHA-256 for {model_name} in {MODEL_MANIFEST_PATH}, download will not be verified")
+
     # If not found, download to the models directory
     model_path = os.path.join(MODEL_DIRECTORY, model_name)
     print(f"Downloading {model_name}...")
-    
-    # YOLOv8 models can be downloaded from Ultralytics
-    if model_name.startswith("yolov8"):
-        url = f"https://github.com/ultralytics/assets/releases/download/v0.0.0/{model_name}"
-    # YOLOv5 models
-    elif model_name.startswith("yolov5"):
-        url = f"https://github.com/ultralytics/assets/releases/download/v0.0.0/{model_name}"
-    else:
-        print(f"Model {model_name} not recognized. Using default model {DEFAULT_MODEL}")
-        return get_model_path(DEFAULT_MODEL) or download_model(DEFAULT_MODEL)
-    
     try:
-        response = requests.get(url, stream=True)
-        total_size = int(response.headers.get('content-length', 0))
-        block_size = 1024
-        progress_bar = tqdm(total=total_size, unit='iB', unit_scale=True)
-        
-        with open(model_path, 'wb') as file:
-            for data in response.iter_content(block_size):
-                progress_bar.update(len(data))
-                file.write(data)
-        
-        progress_bar.close()
+        fetch_file(url, model_path, sha256=sha256)
         print(f"Model downloaded successfully to {model_path}")
         return model_path
-    
+
     except Exception as e:
         print(f"Error downloading model: {e}")
         existing_default = get_model_path(DEFAULT_MODEL)
@@ -79,13 +372,127 @@ def download_model(model_name):
         else:
             raise
 
-def load_model(model_name=DEFAULT_MODEL):
+class LocalYoloDetector:
+    """
+    CPU YOLO runner on OpenCV DNN for ONNX exports (YOLOv5 or YOLOv8-style heads).
+    Frames are letterboxed to a fixed square input; detect() returns objects in
+    the same shape the HF Space returns: {"box": [x, y, w, h], "label_en", "confidence"}.
+    """
+
+    def __init__(self, model_path, input_size=LOCAL_INPUT_SIZE, num_threads=LOCAL_NUM_THREADS,
+                 conf_threshold=LOCAL_CONF_THRESHOLD, iou_threshold=LOCAL_IOU_THRESHOLD,
+                 class_names=COCO_CLASSES):
+        cv2.setNumThreads(num_threads)
+        self.net = cv2.dnn.readNetFromONNX(model_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.model_path = model_path
+        self.input_size = input_size
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+        self.names = class_names
+        # Rough resident size of the weights, used by the model registry
+        self.memory_bytes = os.path.getsize(model_path)
+        # cv2.dnn.Net is not safe to call from several threads at once
+        self._lock = threading.Lock()
+
+    def warmup(self, runs=LOCAL_WARMUP_RUNS):
+        """Run a few dummy inferences so the first real request doesn't pay for graph setup."""
+        dummy = np.zeros((self.input_size, self.input_size, 3), dtype=np.uint8)
+        for _ in range(runs):
+            self.detect(dummy)
+
+    def letterbox(self, frame):
+        """Resize keeping aspect ratio and pad to input_size. Returns (canvas, ratio, pad_x, pad_y)."""
+        height, width = frame.shape[:2]
+        ratio = min(self.input_size / height, self.input_size / width)
+        new_width, new_height = round(width * ratio), round(height * ratio)
+        resized = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+        pad_x = (self.input_size - new_width) // 2
+        pad_y = (self.input_size - new_height) // 2
+        canvas = np.full((self.input_size, self.input_size, 3), 114, dtype=np.uint8)
+        canvas[pad_y:pad_y + new_height, pad_x:pad_x + new_width] = resized
+        return canvas, ratio, pad_x, pad_y
+
+    def _decode_output(self, output):
+        """Return (boxes_cxcywh, class_ids, scores) from a raw YOLO output tensor."""
+        predictions = np.squeeze(output, axis=0)
+        num_classes = len(self.names)
+        if predictions.shape[0] in (4 + num_classes, 5 + num_classes):
+            predictions = predictions.T  # YOLOv8 exports are (features, anchors)
+        if predictions.shape[1] == 5 + num_classes:
+            # YOLOv5: objectness * class probability
+            class_scores = predictions[:, 5:] * predictions[:, 4:5]
+        else:
+            class_scores = predictions[:, 4:]
+        class_ids = np.argmax(class_scores, axis=1)
+        scores = class_scores[np.arange(len(class_ids)), class_ids]
+        keep = scores >= self.conf_threshold
+        return predictions[keep, :4], class_ids[keep], scores[keep]
+
+    def detect(self, frame):
+        """Detect objects in a BGR frame. Boxes are [x, y, w, h] in frame pixels."""
+        canvas, ratio, pad_x, pad_y = self.letterbox(frame)
+        blob = cv2.dnn.blobFromImage(canvas, 1 / 255.0, (self.input_size, self.input_size), swapRB=True)
+        with self._lock:
+            self.net.setInput(blob)
+            output = self.net.forward()
+
+        boxes_cxcywh, class_ids, scores = self._decode_output(output)
+        if len(scores) == 0:
+            return []
+
+        # Undo the letterbox, crop the corners to the frame and convert to [x, y, w, h]
+        height, width = frame.shape[:2]
+        x1 = np.clip((boxes_cxcywh[:, 0] - boxes_cxcywh[:, 2] / 2 - pad_x) / ratio, 0, width)
+        y1 = np.clip((boxes_cxcywh[:, 1] - boxes_cxcywh[:, 3] / 2 - pad_y) / ratio, 0, height)
+        x2 = np.clip((boxes_cxcywh[:, 0] + boxes_cxcywh[:, 2] / 2 - pad_x) / ratio, 0, width)
+        y2 = np.clip((boxes_cxcywh[:, 1] + boxes_cxcywh[:, 3] / 2 - pad_y) / ratio, 0, height)
+        boxes = np.stack([x1, y1, x2 - x1, y2 - y1], axis=1)
+
+        keep = cv2.dnn.NMSBoxesBatched(
+            boxes.tolist(), scores.tolist(), class_ids.tolist(), self.conf_threshold, self.iou_threshold
+        )
+        objects = []
+        for i in np.array(keep).flatten():
+            x, y, w, h = boxes[i]
+            objects.append({
+                "box": [int(x), int(y), int(w), int(h)],
+                "label_en": self.names[class_ids[i]],
+                "confidence": round(float(scores[i]), 4),
+            })
+        return objects
+
+
+def _build_local_detector(model_name):
+    model_path = get_model_path(model_name)
+    if not model_path:
+        raise FileNotFoundError(
+            f"Local detector model {model_name} not found in {ROOT_DIRECTORY} or {MODEL_DIRECTORY}"
+        )
+    print(f"Loading local detector {model_path} ({LOCAL_NUM_THREADS} threads, {LOCAL_INPUT_SIZE}px input)")
+    detector = LocalYoloDetector(model_path)
+    detector.warmup()
+    return detector
+
+
+def load_local_detector(model_name=LOCAL_MODEL):
+    """Return the local ONNX detector, loading and warming it up on first use."""
+    return model_registry.get(model_name, lambda: _build_local_detector(model_name))
+
+
+def load_model(model_name=None):
     """
     Load a model by name, caching it for future use
     
-    Note: This function is now in API mode - it doesn't load models locally
-    but instead returns a placeholder since we're using HF Spaces API
+    With DETECTION_BACKEND=local this loads the ONNX detector (see
+    load_local_detector), LOCAL_MODEL unless another is named. Otherwise
+    it returns a placeholder since detection goes through the HF Spaces API.
     """
+    if model_name is None:
+        model_name = LOCAL_MODEL if DETECTION_BACKEND == 'local' else DEFAULT_MODEL
+    if DETECTION_BACKEND == 'local':
+        return load_local_detector(model_name)
     # Return early with API message
     print(f"API mode: Using remote API for {model_name} instead of loading locally")
     return {"name": model_name, "type": "api_mode"}
@@ -121,23 +528,33 @@ def load_model(model_name=DEFAULT_MODEL):
 def unload_model(model_name):
     """
     Unload a model from memory and cache
-    
-    Note: In API mode, this is just a placeholder
     """
-    if model_name in _models_cache:
+    if model_registry.unload(model_name):
         print(f"Unloading model: {model_name}")
-        del _models_cache[model_name]
         gc.collect()
-        if torch.cuda.is_available():
+        if torch is not None and torch.cuda.is_available():
             torch.cuda.empty_cache()
         return True
     return False
 
 def get_loaded_models():
-    """Return list of loaded model names"""
-    return list(_models_cache.keys())
+    """Return loaded models with their memory use and hit statistics"""
+    return model_registry.stats()
 
 if __name__ == "__main__":
-    # Test function - can be run standalone to verify model loading
-    model = load_model("yolov12l.pt")
+    # Offline benchmark of the local detector:
+    #   python -m utils.model_manager [image_path] [runs]
+    import sys
+    image_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT_DIRECTORY, "..", "assets", "yolo_test.jpg")
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    model = load_local_detector(LOCAL_MODEL)
     print(f"Model loaded with {len(model.names)} classes")
+    frame = cv2.imread(image_path)
+    if frame is None:
+        raise SystemExit(f"Could not read {image_path}")
+    start = time.perf_counter()
+    for _ in range(runs):
+        objects = model.detect(frame)
+    elapsed = (time.perf_counter() - start) / runs
+    print(f"{elapsed * 1000:.1f} ms per frame over {runs} runs, {len(objects)} objects: "
+          f"{sorted(set(obj['label_en'] for obj in objects))}")
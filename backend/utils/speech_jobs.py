@@ -0,0 +1,242 @@
+"""
+In-process job queue for speech requests.
+
+POST /api/speech/jobs answers with a job id as soon as the upload has been
+read; the result is fetched with GET /api/speech/jobs/<id>, optionally
+long-polling with ?wait=<seconds>. A fixed pool of SPEECH_JOB_WORKERS tasks
+on the server event loop works through a bounded queue, so a slow upstream
+ties up queue slots instead of HTTP connections, and a full queue is
+answered with 503 right away. Finished jobs are kept for SPEECH_JOB_TTL
+seconds. The workers are started and stopped by the ASGI lifespan hooks.
+"""
+import asyncio
+import time
+import uuid
+from decouple import config
+from utils.speech_service import speech_service
+
+SPEECH_JOB_WORKERS = config('SPEECH_JOB_WORKERS', default=4, cast=int)
+# Jobs waiting for a worker; each holds its audio until it runs
+SPEECH_JOB_QUEUE_SIZE = config('SPEECH_JOB_QUEUE_SIZE', default=100, cast=int)
+# Seconds a finished job (and its result) stays available
+SPEECH_JOB_TTL = config('SPEECH_JOB_TTL', default=600, cast=int)
+# Longest long-poll wait honoured by GET /api/speech/jobs/<id>?wait=
+SPEECH_JOB_MAX_WAIT = config('SPEECH_JOB_MAX_WAIT', default=30.0, cast=float)
+SPEECH_JOB_MAX_PER_USER = config('SPEECH_JOB_MAX_PER_USER', default=5, cast=int)
+
+FINISHED_STATES = ("done", "failed", "cancelled")
+
+
+class JobQueueFull(Exception):
+    """No room for another job (maps to HTTP 503)."""
+
+
+class SpeechJob:
+    """One queued speech request: queued -> running -> done / failed / cancelled."""
+
+    def __init__(self, owner, audio, audio_format, context):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.audio = audio
+        self.audio_format = audio_format
+        self.context = context
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.task = None  # Upstream call while running
+        self._done = asyncio.Event()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    def finish(self, status, result=None, error=None):
+        self.status = status
+        self.result = result
+        self.error = error
+        self.finished_at = time.time()
+        self.audio = None  # Only the result is kept from here on
+        self._done.set()
+
+    async def wait(self, timeout):
+        """Wait up to timeout seconds for the job to finish."""
+        if self.finished or timeout <= 0:
+            return
+        try:
+            await asyncio.wait_for(self._done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def as_dict(self):
+        data = {"job_id": self.id, "status": self.status, "created_at": self.created_at}
+        if self.finished_at is not None:
+            data["finished_at"] = self.finished_at
+        if self.result is not None:
+            data["result"] = self.result
+        if self.error is not None:
+            data["message"] = self.error
+        return data
+
+
+class SpeechJobQueue:
+    """Bounded job queue drained by a fixed pool of worker tasks on the server loop."""
+
+    def __init__(self, workers=SPEECH_JOB_WORKERS, max_queued=SPEECH_JOB_QUEUE_SIZE, ttl=SPEECH_JOB_TTL,
+                 max_per_user=SPEECH_JOB_MAX_PER_USER):
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self.max_per_user = max_per_user
+        self.jobs = {}  # job id -> SpeechJob
+        self._queue = None
+        self._tasks = []
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.rejected = 0
+        self.expired = 0
+
+    @property
+    def running(self):
+        return self._queue is not None
+
+    async def start(self):
+        """Create the queue and worker tasks on the running (server) event loop."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.ensure_future(self._sweep()))
+        print(f"Speech job queue started ({self.workers} workers, {self.max_queued} queued max)")
+
+    async def stop(self):
+        """Stop the workers; unfinished jobs are cancelled."""
+        if not self.running:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for job in self.jobs.values():
+            if not job.finished:
+                job.finish("cancelled", error="Server shutting down")
+        self._queue = None
+        self._tasks = []
+        print("Speech job queue stopped")
+
+    def check_capacity(self):
+        """Raise JobQueueFull if a job submitted now would be refused (checked before reading uploads)."""
+        if not self.running:
+            raise JobQueueFull("Speech job queue is not running")
+        if self._queue.full():
+            self.rejected += 1
+            raise JobQueueFull("Speech job queue is full")
+
+    def submit(self, owner, audio, audio_format, context):
+        """Queue a job. Raises JobQueueFull when the queue (or the user's share of it) is full."""
+        if not self.running:
+            raise JobQueueFull("Speech job queue is not running")
+        active = sum(1 for job in self.jobs.values() if job.owner == owner and not job.finished)
+        if active >= self.max_per_user:
+            self.rejected += 1
+            raise JobQueueFull(f"Too many speech jobs in progress (max {self.max_per_user})")
+        job = SpeechJob(owner, audio, audio_format, context)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise JobQueueFull("Speech job queue is full")
+        self.jobs[job.id] = job
+        self.submitted += 1
+        return job
+
+    def get(self, job_id, owner):
+        """The owner's job, or None if unknown, expired or someone else's."""
+        job = self.jobs.get(job_id)
+        if job is None or job.owner != owner or self._expired(job, time.time()):
+            return None
+        return job
+
+    def cancel(self, job):
+        """Cancel a queued or running job. Returns False if it had already finished."""
+        if job.finished:
+            return False
+        if job.task is not None:
+            job.task.cancel()  # Stops the upstream call
+        job.finish("cancelled")  # A queued job is skipped when a worker reaches it
+        self.cancelled += 1
+        return True
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.finished:
+                    continue  # Cancelled while queued
+                job.status = "running"
+                job.task = asyncio.ensure_future(
+                    speech_service.process_buffered(job.audio, job.audio_format, job.context)
+                )
+                try:
+                    await asyncio.wait({job.task})
+                except asyncio.CancelledError:
+                    job.task.cancel()  # Worker stopped (shutdown)
+                    raise
+                if job.finished:
+                    continue  # Cancelled while running
+                if job.task.cancelled():
+                    job.finish("cancelled")
+                    self.cancelled += 1
+                elif job.task.exception() is not None:
+                    print(f"Speech job {job.id} failed: {job.task.exception()}")
+                    job.finish("failed", error="Speech processing failed")
+                    self.failed += 1
+                elif job.task.result().get("type") == "error":
+                    # Reported rather than raised, e.g. a clip without speech
+                    job.finish("failed", error=job.task.result().get("message"))
+                    self.failed += 1
+                else:
+                    job.finish("done", result=job.task.result())
+                    self.completed += 1
+            finally:
+                self._queue.task_done()
+
+    def _expired(self, job, now):
+        return job.finished and job.finished_at <= now - self.ttl
+
+    def purge_expired(self):
+        """Drop finished jobs older than the TTL. Returns the number removed."""
+        now = time.time()
+        expired = [job_id for job_id, job in self.jobs.items() if self._expired(job, now)]
+        for job_id in expired:
+            del self.jobs[job_id]
+        self.expired += len(expired)
+        return len(expired)
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(max(1, min(60, self.ttl)))
+            self.purge_expired()
+
+    def stats(self):
+        states = [job.status for job in self.jobs.values()]
+        return {
+            "workers": self.workers,
+            "started": self.running,
+            "queued": states.count("queued"),
+            "in_progress": states.count("running"),
+            "jobs": len(states),
+            "max_queued": self.max_queued,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "rejected": self.rejected,
+            "expired": self.expired,
+        }
+
+
+# Create global queue instance
+speech_jobs = SpeechJobQueue()
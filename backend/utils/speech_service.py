@@ -1,7 +1,81 @@
 import asyncio
+import hashlib
 import json
 import aiohttp
 import io
+from werkzeug.exceptions import HTTPException
+from utils.http_client import HF_SPACE_URL, upstream
+from utils.speech_upload import FORWARDED_FIELDS, SpeechUploadError, StreamedSpeechUpload
+from utils.audio_processing import (
+    AUDIO_PREPROCESS, SilentAudioError, preprocess_audio, preprocessing_available, segment_audio,
+)
+from utils.cache import LRUCache
+from utils.tracing import span
+from decouple import config
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Upstream calls in flight per segmented speech request
+SPEECH_SEGMENT_CONCURRENCY = config('SPEECH_SEGMENT_CONCURRENCY', default=3, cast=int)
+
+# Fields of the Space's answer kept in the speech result cache
+_CACHED_RESULT_FIELDS = ("detected_language", "transcribed_text", "translated_text")
+
+
+def _result_size(result):
+    return 200 + sum(len(value) * 4 for value in result.values() if isinstance(value, str))
+
+
+# Upstream speech results keyed by (digest of the audio sent, format, language pair).
+# Replayed phrases and client retries are answered without another ASR +
+# translation call; `person` is recomputed from each request's context.
+speech_result_cache = LRUCache(
+    max_entries=config('SPEECH_CACHE_SIZE', default=256, cast=int),
+    ttl=config('SPEECH_CACHE_TTL', default=3600, cast=int),
+    max_bytes=config('SPEECH_CACHE_MAX_BYTES', default=2 * 1024 * 1024, cast=int),
+    sizeof=_result_size,
+    name="speech",
+)
+
+
+def speech_cache_key(audio_digest, audio_format, context):
+    """
+    Cache key for a clip. The pair is kept in order: when the Space returns no
+    detected_language, build_result falls back to language1.
+    """
+    return (audio_digest, audio_format, context.language1, context.language2)
+
+
+class SpeechContext:
+    """
+    Immutable language settings of one speech request. Passed down the call
+    chain instead of being stored on the shared service, so concurrent
+    conversations never see each other's languages.
+    """
+    __slots__ = ("language1", "language2")
+
+    def __init__(self, language1, language2):
+        object.__setattr__(self, "language1", language1)
+        object.__setattr__(self, "language2", language2)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("SpeechContext is immutable")
+
+    def person(self, detected_lang):
+        """Person 1 speaks language1, person 2 speaks language2."""
+        return "1" if detected_lang == self.language1 else "2"
+
+    def other_language(self, detected_lang):
+        """Language the detected speech is translated into."""
+        return self.language2 if detected_lang == self.language1 else self.language1
+
+    def settings(self):
+        return {"language1": self.language1, "language2": self.language2}
+
+    def __repr__(self):
+        return f"SpeechContext({self.language1!r}, {self.language2!r})"
+
 
 class SpeechTranslationService:
     def __init__(self):
@@ -21,36 +95,102 @@ class SpeechTranslationService:
             'mr': {'name': 'Marathi', 'code': 'mr-IN'},
             'kn': {'name': 'Kannada', 'code': 'kn-IN'}
         }
-        # Store target languages for determining person
-        self.language1 = None
-        self.language2 = None
 
-    def set_languages(self, lang1, lang2):
-        """Set the source and target languages"""
+    def make_context(self, lang1, lang2):
+        """Validate a language pair and return the request's SpeechContext."""
         if lang1 not in self.supported_languages or lang2 not in self.supported_languages:
             raise ValueError(f"Unsupported language provided. Supported: {list(self.supported_languages.keys())}")
         if lang1 == lang2:
             raise ValueError("Source and target languages must be different")
-        self.language1 = lang1
-        self.language2 = lang2
-        print(f"Languages set for request: {lang1} -> {lang2}")
-        return True
-
-    def get_person(self, detected_lang):
-        """Return person identifier based on detected language compared to set languages."""
-        if not self.language1 or not self.language2:
-             print("Warning: Languages not set for person determination, defaulting to 1")
-             return "1"
-        # Assume person 1 speaks language1, person 2 speaks language2
-        return "1" if detected_lang == self.language1 else "2"
+        return SpeechContext(lang1, lang2)
+
+    async def _post_speech(self, space_url, form_data, headers=None):
+        """POST the form (FormData or a streamed body) to the Space over the pooled session and return the JSON result."""
+        async with upstream.session() as session:
+            async with session.post(space_url, data=form_data, headers=headers, timeout=aiohttp.ClientTimeout(total=90)) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise Exception(f"Speech Processing API Error {response.status}: {error_text}")
+                return await response.json()
+
+    def build_result(self, result, context):
+        """Turn the Space's JSON answer into the response structure expected by the frontend."""
+        detected_lang = result.get("detected_language")
+        transcribed_text = result.get("transcribed_text", "")
+        translated_text = result.get("translated_text", "")
+
+        if not detected_lang:
+            print("Warning: API did not return detected_language. Falling back to lang1.")
+            detected_lang = context.language1
+
+        # Get the person identifier based on the detected language
+        person = context.person(detected_lang)
+
+        print(f"API Result -> Detected: {detected_lang}, Person: {person}")
+        logger.debug("Transcribed: %s", transcribed_text[:50])
+        logger.debug("Translated: %s", translated_text[:50])
+
+        return {
+            "type": "translation",
+            "person": person,
+            "original": {"text": transcribed_text, "language": detected_lang},
+            "translated": {"text": translated_text, "language": context.other_language(detected_lang)},
+            "languageSettings": context.settings()
+        }
+
+    async def normalize_audio(self, audio_binary, audio_format):
+        """
+        Run the optional preprocessing stage (see utils/audio_processing.py).
+        Returns (audio, format); raises SilentAudioError for clips without speech.
+        """
+        if not (AUDIO_PREPROCESS and preprocessing_available(audio_format)):
+            return audio_binary, audio_format
+        try:
+            with span("preprocess"):
+                processed = await asyncio.to_thread(preprocess_audio, audio_binary, audio_format)
+        except SilentAudioError:
+            raise
+        except Exception as e:
+            print(f"[WARN] Audio preprocessing failed ({e}); sending the original clip")
+            return audio_binary, audio_format
+        logger.debug("Audio preprocessed: %s", processed)
+        return processed.data, processed.format
 
-    async def process_speech_via_api(self, audio_binary, audio_format, lang1, lang2):
+    async def process_buffered(self, audio_binary, audio_format, context):
+        """Normalize a complete clip and send it upstream. Silent clips never reach upstream."""
+        try:
+            audio_binary, audio_format = await self.normalize_audio(audio_binary, audio_format)
+        except SilentAudioError as e:
+            logger.debug("Rejected clip without speech (%d bytes)", len(audio_binary))
+            return {"type": "error", "message": str(e)}
+        return await self.process_speech_via_api(audio_binary, audio_format, context)
+
+    def cached_result(self, cache_key, context):
+        """Response for a cached clip, built for this request's context, or None."""
+        cached = speech_result_cache.get(cache_key)
+        if cached is None:
+            return None
+        logger.debug("Speech cache hit (%s <-> %s)", context.language1, context.language2)
+        return self.build_result(cached, context)
+
+    def remember_result(self, cache_key, result):
+        # Only the fields the Space returned, so a replay sees the same defaults as the first call
+        speech_result_cache.set(cache_key, {
+            name: result[name] for name in _CACHED_RESULT_FIELDS if result.get(name) is not None
+        })
+
+    async def process_speech_via_api(self, audio_binary, audio_format, context):
         """Process audio using the HuggingFace API call for transcription and translation."""
+        lang1, lang2 = context.language1, context.language2
+        cache_key = speech_cache_key(hashlib.blake2b(audio_binary, digest_size=16).hexdigest(), audio_format, context)
+        cached = self.cached_result(cache_key, context)
+        if cached is not None:
+            return cached
         try:
             print(f"Processing {audio_format} audio data via Hugging Face API ({lang1} -> {lang2})...")
 
             # Use the actual Hugging Face Space endpoint
-            space_url = "https://monilm-lingual.hf.space/api/speech" 
+            space_url = f"{HF_SPACE_URL}/api/speech"
 
             # Prepare the form data for the API request
             form_data = aiohttp.FormData()
@@ -65,43 +205,12 @@ class SpeechTranslationService:
             form_data.add_field('lang2', lang2)
             form_data.add_field('format', audio_format)
 
-            # Make the API request
-            async with aiohttp.ClientSession() as session:
-                async with session.post(space_url, data=form_data, timeout=90) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        raise Exception(f"Speech Processing API Error {response.status}: {error_text}")
-
-                    result = await response.json()
-
-                    # Process the actual response format from the API
-                    detected_lang = result.get("detected_language")
-                    transcribed_text = result.get("transcribed_text", "")
-                    translated_text = result.get("translated_text", "")
-
-                    if not detected_lang:
-                        print("Warning: API did not return detected_language. Falling back to lang1.")
-                        detected_lang = lang1
-
-                    # Get the person identifier based on the detected language
-                    person = self.get_person(detected_lang)
-
-                    print(f"API Result -> Detected: {detected_lang}, Person: {person}")
-                    print(f"Transcribed: {transcribed_text[:50]}...")
-                    print(f"Translated: {translated_text[:50]}...")
-                    print("=================================")
-
-                    # Return the response structure expected by frontend
-                    return {
-                        "type": "translation",
-                        "person": person,
-                        "original": {"text": transcribed_text, "language": detected_lang},
-                        "translated": {"text": translated_text, "language": lang2 if detected_lang == lang1 else lang1},
-                        "languageSettings": {
-                            "language1": self.language1,
-                            "language2": self.language2
-                        }
-                    }
+            # Make the API request over the pooled session
+            with span("speech_upstream"):
+                result = await self._post_speech(space_url, form_data)
+            self.remember_result(cache_key, result)
+
+            return self.build_result(result, context)
 
         except aiohttp.ClientError as e:
             raise Exception(f"API call failed: {str(e)}")
@@ -121,11 +230,11 @@ async def handle_speech_api_request(audio_binary, audio_format, lang1, lang2):
     Accepts the audio binary directly rather than base64 encoded string.
     """
     try:
-        # Set languages for this specific request context
-        speech_service.set_languages(lang1, lang2)
-        
-        # Call the API endpoint with binary data directly
-        result = await speech_service.process_speech_via_api(audio_binary, audio_format, lang1, lang2)
+        # Languages travel with the request instead of being set on the shared service
+        context = speech_service.make_context(lang1, lang2)
+
+        # Normalize (when enabled) and call the API endpoint with binary data directly
+        result = await speech_service.process_buffered(audio_binary, audio_format, context)
         
         return result
 
@@ -137,4 +246,144 @@ async def handle_speech_api_request(audio_binary, audio_format, lang1, lang2):
         import traceback
         print(f"API Request Error (Exception): {type(e).__name__} - {str(e)}\n{traceback.format_exc()}")
         # Return a user-friendly error message
-        return {"type": "error", "message": f"An unexpected error occurred during speech processing."}
\ No newline at end of file
+        return {"type": "error", "message": f"An unexpected error occurred during speech processing."}
+
+def _upload_context(upload):
+    """Check a parsed upload has audio and all fields; return its SpeechContext. Raises ValueError."""
+    if upload.audio_filename is None:
+        raise SpeechUploadError("No audio file provided")
+    missing = [name for name in FORWARDED_FIELDS if not upload.fields.get(name)]
+    if missing:
+        raise SpeechUploadError(f"Missing required parameters: {', '.join(missing)}")
+    return speech_service.make_context(upload.fields['lang1'], upload.fields['lang2'])
+
+
+async def read_speech_upload(body_chunks, content_type):
+    """
+    Read a whole multipart speech upload. Returns (audio, audio_format, context);
+    raises SpeechUploadError for malformed uploads and ValueError for bad languages.
+    """
+    upload = StreamedSpeechUpload(body_chunks, content_type)
+    try:
+        with span("upload"):
+            await upload.parse(lambda: None)
+        context = _upload_context(upload)
+        return await upload.read_audio(), upload.fields['format'], context
+    except BaseException:
+        upload.abort()
+        raise
+
+
+async def stream_segmented_speech(audio_binary, audio_format, context, event_stream=False):
+    """
+    Split a clip at pauses and translate the pieces concurrently (at most
+    SPEECH_SEGMENT_CONCURRENCY upstream calls at once), yielding one encoded
+    message per piece, in order, as soon as it and all earlier ones are done.
+    Messages keep the usual type/person/original/translated structure plus
+    segment/segments/start_ms/end_ms, and the stream ends with a "done"
+    message. Encoded as NDJSON lines, or SSE events when event_stream is set.
+    """
+    def encode(message):
+        data = json.dumps(message, ensure_ascii=False)
+        return f"data: {data}\n\n".encode("utf-8") if event_stream else (data + "\n").encode("utf-8")
+
+    # (audio, format, start_ms, end_ms) per piece; the whole clip when it cannot be decoded here
+    pieces = [(audio_binary, audio_format, None, None)]
+    if preprocessing_available(audio_format):
+        try:
+            segments = await asyncio.to_thread(segment_audio, audio_binary, audio_format)
+            pieces = [(seg.data, seg.format, seg.start_ms, seg.end_ms) for seg in segments]
+        except SilentAudioError as e:
+            yield encode({"type": "error", "message": str(e)})
+            yield encode({"type": "done", "segments": 0})
+            return
+        except Exception as e:
+            print(f"[WARN] Audio segmentation failed ({e}); sending the clip as one segment")
+    logger.debug("Segmented speech: %d segment(s) (%s <-> %s)", len(pieces), context.language1, context.language2)
+
+    slots = asyncio.Semaphore(SPEECH_SEGMENT_CONCURRENCY)
+
+    async def translate_piece(data, piece_format):
+        async with slots:
+            return await speech_service.process_speech_via_api(data, piece_format, context)
+
+    tasks = [asyncio.ensure_future(translate_piece(data, piece_format)) for data, piece_format, _, _ in pieces]
+    try:
+        for index, (task, (_, _, start_ms, end_ms)) in enumerate(zip(tasks, pieces)):
+            try:
+                message = dict(await task)
+            except Exception as e:
+                message = {"type": "error", "message": f"Segment could not be processed: {e}"}
+            message.update({"segment": index, "segments": len(pieces)})
+            if start_ms is not None:
+                message.update({"start_ms": start_ms, "end_ms": end_ms})
+            yield encode(message)
+        yield encode({"type": "done", "segments": len(pieces)})
+    finally:
+        # Client went away (or we're done): stop any remaining upstream calls
+        for task in tasks:
+            task.cancel()
+
+
+async def handle_streamed_speech_request(body_chunks, content_type):
+    """
+    Handles a speech request whose multipart body (audio, lang1, lang2, format)
+    is still arriving: the audio is streamed into the upstream request as it is
+    read, so the clip is never buffered whole. With AUDIO_PREPROCESS the clip
+    is collected first instead, since it has to be decoded as a whole.
+    Returns the same structure as handle_speech_api_request; raises
+    SpeechUploadError for unusable uploads.
+    """
+    upload = StreamedSpeechUpload(body_chunks, content_type)
+    space_url = f"{HF_SPACE_URL}/api/speech"
+    buffer_audio = AUDIO_PREPROCESS and preprocessing_available()
+
+    def start_upstream():
+        if buffer_audio:
+            return None
+        return asyncio.ensure_future(speech_service._post_speech(
+            space_url, upload.upstream_body(), headers={"Content-Type": upload.content_type}
+        ))
+
+    try:
+        with span("upload"):
+            await upload.parse(start_upstream)
+        task = upload.upstream_task
+        if task is None or not task.done():
+            try:
+                context = _upload_context(upload)
+            except SpeechUploadError:
+                raise
+            except ValueError as e:
+                print(f"API Request Error (ValueError): {str(e)}")
+                upload.abort()
+                return {"type": "error", "message": str(e)}
+        else:
+            context = None  # Upstream failed mid-upload; awaiting the task raises its error
+        cache_key = None
+        if task is None:
+            audio_binary = await upload.read_audio()
+            return await speech_service.process_buffered(audio_binary, upload.fields['format'], context)
+        if context is not None:
+            # Whole clip hashed while it streamed: a replayed clip doesn't need the upstream answer
+            cache_key = speech_cache_key(upload.audio_digest, upload.fields['format'], context)
+            cached = speech_service.cached_result(cache_key, context)
+            if cached is not None:
+                upload.abort()
+                return cached
+        upload.release_fields()
+        logger.debug("Streamed %d bytes of audio upstream (%d spooled to disk)", upload.audio_bytes, upload.pipe.spooled_bytes)
+        with span("speech_upstream"):
+            result = await task
+        if cache_key is not None:
+            speech_service.remember_result(cache_key, result)
+        return speech_service.build_result(result, context)
+    except (SpeechUploadError, HTTPException, ConnectionError, asyncio.CancelledError):
+        # Bad upload, over the size cap, client gone or request cancelled
+        upload.abort()
+        raise
+    except Exception as e:
+        upload.abort()
+        import traceback
+        print(f"API Request Error (Exception): {type(e).__name__} - {str(e)}\n{traceback.format_exc()}")
+        return {"type": "error", "message": f"An unexpected error occurred during speech processing."}
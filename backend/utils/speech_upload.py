@@ -0,0 +1,276 @@
+"""
+Streaming pass-through of speech uploads to the HF Space.
+
+The multipart upload is parsed incrementally (werkzeug's sans-IO decoder) and
+the audio part is forwarded chunk by chunk into the upstream multipart body,
+so a clip is never held in memory as a whole. Chunks pass through an
+AudioPipe: up to SPEECH_STREAM_MEMORY_BYTES wait in memory, and only when
+the upstream falls further behind the client is the excess spooled to a
+temporary file. The text fields (lang1, lang2, format) are sent after the
+audio, since the app uploads them after the file.
+"""
+import asyncio
+import hashlib
+import tempfile
+import threading
+import uuid
+from collections import deque
+from decouple import config
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+# Largest audio part accepted from the client
+SPEECH_MAX_AUDIO_BYTES = config('SPEECH_MAX_AUDIO_BYTES', default=25 * 1024 * 1024, cast=int)
+# Audio buffered in memory per request before spooling to disk
+SPEECH_STREAM_MEMORY_BYTES = config('SPEECH_STREAM_MEMORY_BYTES', default=1024 * 1024, cast=int)
+SPOOL_READ_SIZE = 256 * 1024
+MAX_FIELD_BYTES = 1024
+MAX_PARTS = 16
+FORWARDED_FIELDS = ('lang1', 'lang2', 'format')
+
+
+class SpeechUploadError(ValueError):
+    """The upload is not a usable speech request (maps to HTTP 400)."""
+
+
+class AudioPipe:
+    """
+    Single-producer, single-consumer byte pipe. put() never waits for the
+    consumer: chunks queue in memory up to memory_limit and overflow to a
+    temporary file, which is dropped again once the consumer catches up.
+    """
+
+    def __init__(self, memory_limit=SPEECH_STREAM_MEMORY_BYTES):
+        self.memory_limit = memory_limit
+        self._chunks = deque()
+        self._memory_bytes = 0
+        self._spool = None  # Temporary file while the consumer is behind
+        self._spool_lock = threading.Lock()
+        self._spool_read = 0
+        self._spool_written = 0
+        self._writing = False
+        self._closed = False
+        self._ready = asyncio.Event()
+        self.total_bytes = 0
+        self.spooled_bytes = 0
+
+    async def put(self, data):
+        if not data:
+            return
+        self.total_bytes += len(data)
+        if self._spool is None and self._memory_bytes + len(data) <= self.memory_limit:
+            self._chunks.append(data)
+            self._memory_bytes += len(data)
+        else:
+            # Consumer is behind: keep order by appending everything to the spool until it drains
+            if self._spool is None:
+                self._spool = tempfile.TemporaryFile(prefix="speech-")
+            self._writing = True
+            try:
+                await asyncio.to_thread(self._write_spool, self._spool, self._spool_written, data)
+            finally:
+                self._writing = False
+                if self._closed and self._spool is not None:
+                    # Discarded while writing: discard() left the spool for us to close
+                    self._spool.close()
+                    self._spool = None
+            self._spool_written += len(data)
+            self.spooled_bytes += len(data)
+        self._ready.set()
+
+    def _write_spool(self, spool, offset, data):
+        with self._spool_lock:
+            spool.seek(offset)
+            spool.write(data)
+
+    def _read_spool(self, spool, offset, size):
+        with self._spool_lock:
+            spool.seek(offset)
+            return spool.read(size)
+
+    def close(self):
+        """Mark the end of the data; the consumer finishes after draining what is queued."""
+        self._closed = True
+        self._ready.set()
+
+    def discard(self):
+        """Drop queued data and the spool file (request aborted; put() closes a spool it is writing to)."""
+        self._closed = True
+        self._chunks.clear()
+        self._memory_bytes = 0
+        if self._spool is not None and not self._writing:
+            self._spool.close()
+            self._spool = None
+        self._ready.set()
+
+    def __aiter__(self):
+        return self._drain()
+
+    async def _drain(self):
+        while True:
+            if self._chunks:
+                data = self._chunks.popleft()
+                self._memory_bytes -= len(data)
+                yield data
+                continue
+            if self._spool is not None:
+                if self._spool_read < self._spool_written:
+                    size = min(SPOOL_READ_SIZE, self._spool_written - self._spool_read)
+                    data = await asyncio.to_thread(self._read_spool, self._spool, self._spool_read, size)
+                    self._spool_read += len(data)
+                    yield data
+                    continue
+                if not self._writing:
+                    # Caught up: go back to memory buffering
+                    self._spool.close()
+                    self._spool = None
+                    self._spool_read = self._spool_written = 0
+                    continue
+            if self._closed:
+                return
+            self._ready.clear()
+            await self._ready.wait()
+
+
+def multipart_boundary(content_type):
+    mimetype, options = parse_options_header(content_type or "")
+    boundary = options.get("boundary")
+    if mimetype != "multipart/form-data" or not boundary:
+        raise SpeechUploadError("Expected a multipart/form-data upload")
+    return boundary.encode("latin-1")
+
+
+def _part_header(boundary, name, filename=None, content_type=None):
+    disposition = f'form-data; name="{name}"'
+    if filename is not None:
+        safe_name = filename.replace('"', '').replace('\r', '').replace('\n', '')
+        disposition += f'; filename="{safe_name}"'
+    lines = [f"--{boundary}", f"Content-Disposition: {disposition}"]
+    if content_type:
+        lines.append(f"Content-Type: {content_type}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("utf-8")
+
+
+class StreamedSpeechUpload:
+    """
+    Parses a speech upload from body chunks and exposes the upstream request
+    body (audio first, then the text fields) as an async generator.
+    """
+
+    def __init__(self, body_chunks, content_type, max_audio_bytes=SPEECH_MAX_AUDIO_BYTES,
+                 memory_limit=SPEECH_STREAM_MEMORY_BYTES):
+        self.body_chunks = body_chunks
+        # Field sizes are checked in _handle_data; the decoder's own limit applies to its raw buffer
+        self.decoder = MultipartDecoder(multipart_boundary(content_type), max_parts=MAX_PARTS)
+        self.max_audio_bytes = max_audio_bytes
+        self.pipe = AudioPipe(memory_limit)
+        self.fields = {}
+        self.audio_filename = None
+        self.audio_content_type = None
+        self.audio_bytes = 0
+        self._audio_hash = hashlib.blake2b(digest_size=16)  # Updated as the audio streams through
+        self.boundary = uuid.uuid4().hex
+        self._fields_ready = asyncio.get_running_loop().create_future()
+        self._part = None  # ("audio",) / ("field", name, bytearray) / ("skip",)
+        self.upstream_task = None
+
+    async def parse(self, on_audio_start):
+        """
+        Read the whole client body. on_audio_start() is called when the audio
+        part begins and returns the upstream request task, which then runs
+        while the upload is still arriving (or None to keep the audio for
+        read_audio()). Stops early if that task fails.
+        Raises SpeechUploadError for malformed uploads.
+        """
+        try:
+            async for chunk in self.body_chunks:
+                self.decoder.receive_data(chunk)
+                await self._process_events(on_audio_start)
+                task = self.upstream_task
+                if task is not None and task.done() and not task.cancelled() and task.exception():
+                    return  # Upstream already failed - no point reading the rest
+            self.decoder.receive_data(None)
+            await self._process_events(on_audio_start)
+        except SpeechUploadError:
+            raise
+        except ValueError as e:
+            # Malformed multipart data from the decoder
+            raise SpeechUploadError(str(e)) from e
+        self.pipe.close()
+
+    async def _process_events(self, on_audio_start):
+        while True:
+            event = self.decoder.next_event()
+            if isinstance(event, NeedData) or isinstance(event, Epilogue):
+                return
+            if isinstance(event, File):
+                if event.name == 'audio' and self.audio_filename is None:
+                    self._part = ("audio",)
+                    self.audio_filename = event.filename or "audio"
+                    self.audio_content_type = event.headers.get("content-type")
+                    self.upstream_task = on_audio_start()
+                else:
+                    self._part = ("skip",)
+            elif isinstance(event, Field):
+                self._part = ("field", event.name, bytearray())
+            elif isinstance(event, Data):
+                await self._handle_data(event)
+
+    async def _handle_data(self, event):
+        part = self._part
+        if part[0] == "audio":
+            self.audio_bytes += len(event.data)
+            if self.audio_bytes > self.max_audio_bytes:
+                raise RequestEntityTooLarge()
+            self._audio_hash.update(event.data)
+            await self.pipe.put(event.data)
+        elif part[0] == "field":
+            part[2].extend(event.data)
+            if len(part[2]) > MAX_FIELD_BYTES:
+                raise SpeechUploadError(f"Form field '{part[1]}' is too long")
+            if not event.more_data:
+                self.fields[part[1]] = part[2].decode("utf-8", "replace")
+
+    @property
+    def audio_digest(self):
+        """Digest of the audio received so far (the whole clip once parse() returns)."""
+        return self._audio_hash.hexdigest()
+
+    async def read_audio(self):
+        """Collect the whole audio part (for uploads that are not streamed upstream)."""
+        return b"".join([chunk async for chunk in self.pipe])
+
+    def release_fields(self):
+        """Let the upstream body finish with the (validated) text fields."""
+        if not self._fields_ready.done():
+            self._fields_ready.set_result(dict(self.fields))
+
+    def abort(self):
+        """Stop the upstream request and drop buffered audio."""
+        if self.upstream_task is not None:
+            self.upstream_task.cancel()
+        self.pipe.discard()
+        if not self._fields_ready.done():
+            self._fields_ready.cancel()
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    async def upstream_body(self):
+        """Multipart body for the upstream request, generated as the upload streams in."""
+        audio_format = self.fields.get('format')
+        if audio_format:
+            filename, content_type = f"audio.{audio_format}", f"audio/{audio_format}"
+        else:
+            # Fields usually arrive after the file - forward the client's own part headers
+            filename, content_type = self.audio_filename, self.audio_content_type or "application/octet-stream"
+        yield _part_header(self.boundary, 'audio', filename, content_type)
+        async for chunk in self.pipe:
+            yield chunk
+        yield b"\r\n"
+        fields = await self._fields_ready
+        for name in FORWARDED_FIELDS:
+            yield _part_header(self.boundary, name) + fields[name].encode("utf-8") + b"\r\n"
+        yield f"--{self.boundary}--\r\n".encode("latin-1")
@@ -0,0 +1,94 @@
+"""
+Pre-serialized responses for the static content endpoints.
+
+Guidebook, phrases, quiz and speech config bodies change only when the
+content files do, so each distinct body is serialized to JSON once, stored
+gzip- (and, with the optional brotli package, brotli-) compressed, and
+tagged with a strong ETag. Requests get the best encoding they accept, and a
+matching If-None-Match is answered with an empty 304. Bodies are rebuilt
+when the content store hands out a new object after a reload.
+
+Most of these bodies depend on the user (target language, quiz progress)
+while the URL does not, so by default clients must revalidate on every use;
+an unchanged body then costs only the 304. A max-age is only sent for
+bodies the URL fully determines.
+"""
+import gzip
+import hashlib
+import json
+from decouple import config
+from flask import Response, request
+from utils.cache import LRUCache
+
+try:
+    import brotli
+except ImportError:  # Optional dependency
+    brotli = None
+
+# Browser/app cache lifetime for bodies the URL alone determines (e.g. speech config)
+STATIC_CONTENT_MAX_AGE = config('STATIC_CONTENT_MAX_AGE', default=300, cast=int)
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 512
+
+
+class PreparedBody:
+    """A JSON body serialized once, with its compressed variants and ETag."""
+
+    def __init__(self, payload):
+        self.body = (json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":")) + "\n").encode("utf-8")
+        self.etag = hashlib.blake2b(self.body, digest_size=16).hexdigest()
+        self.encoded = {}
+        if len(self.body) >= MIN_COMPRESS_BYTES:
+            self.encoded["gzip"] = gzip.compress(self.body, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self.encoded["br"] = brotli.compress(self.body, quality=11)
+
+    @property
+    def size(self):
+        return len(self.body) + sum(len(data) for data in self.encoded.values())
+
+
+# key -> (source object, PreparedBody); the source is kept so a reloaded one is noticed
+_prepared = LRUCache(
+    max_entries=config('STATIC_RESPONSE_CACHE_SIZE', default=512, cast=int),
+    max_bytes=config('STATIC_RESPONSE_CACHE_MAX_BYTES', default=32 * 1024 * 1024, cast=int),
+    sizeof=lambda entry: entry[1].size,
+    name="static_responses",
+)
+
+
+def prepared_body(key, source, build):
+    """
+    PreparedBody for key, serializing build() only on the first call or
+    when `source` (the content it is built from) is a different object.
+    """
+    entry = _prepared.get(key)
+    if entry is not None and entry[0] is source:
+        return entry[1]
+    prepared = PreparedBody(build())
+    _prepared.set(key, (source, prepared))
+    return prepared
+
+
+def send_prepared(prepared, max_age=None):
+    """
+    Response for a PreparedBody: 304 on a matching If-None-Match, else the
+    best accepted encoding. Without max_age the client revalidates every time.
+    """
+    if request.if_none_match.contains_weak(prepared.etag):
+        response = Response(status=304)
+    else:
+        # Brotli first when the client takes both
+        encoding = request.accept_encodings.best_match([name for name in ("br", "gzip") if name in prepared.encoded])
+        response = Response(prepared.encoded[encoding] if encoding else prepared.body,
+                            mimetype="application/json")
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+    response.set_etag(prepared.etag)
+    response.headers["Cache-Control"] = f"private, max-age={max_age}" if max_age else "private, no-cache"
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def stats():
+    return _prepared.stats()
@@ -0,0 +1,94 @@
+"""
+Lightweight per-request stage timing.
+
+A Trace is started for a sampled fraction of requests (TRACE_SAMPLE_RATE) and
+kept in a context variable, so `with span("stage"):` works anywhere below the
+view - in coroutines, and in threads started with asyncio.to_thread. When the
+request finishes the spans are reported in one structured log line. A
+Server-Timing header with the same spans is only added when
+TRACE_SERVER_TIMING is set: stage names (and missing stages, e.g. a cache
+hit) are visible to every client, so it is meant for debugging only.
+"""
+import contextvars
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+from decouple import config
+
+# Fraction of requests that are traced (0 disables tracing, 1 traces everything)
+TRACE_SAMPLE_RATE = config('TRACE_SAMPLE_RATE', default=0.01, cast=float)
+# Also send the spans of traced requests to the client as a Server-Timing header
+TRACE_SERVER_TIMING = config('TRACE_SERVER_TIMING', default=False, cast=bool)
+
+logger = logging.getLogger("lingual.timing")
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """Stage durations for one request. Spans with the same name are summed."""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans = {}  # stage -> [total_ms, count], in first-seen order
+
+    def add(self, stage, duration_ms):
+        entry = self.spans.setdefault(stage, [0.0, 0])
+        entry[0] += duration_ms
+        entry[1] += 1
+
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self):
+        """Render the spans (plus the total) as a Server-Timing header value."""
+        parts = [f"{stage};dur={total:.1f}" for stage, (total, _) in self.spans.items()]
+        parts.append(f"total;dur={self.total_ms():.1f}")
+        return ", ".join(parts)
+
+    def as_dict(self):
+        return {
+            "trace": self.name,
+            "total_ms": round(self.total_ms(), 1),
+            "spans": {stage: {"ms": round(total, 1), "count": count} for stage, (total, count) in self.spans.items()},
+        }
+
+
+def start_trace(name, sample_rate=None):
+    """Start a trace for the current context if this request is sampled. Returns (trace, token)."""
+    rate = TRACE_SAMPLE_RATE if sample_rate is None else sample_rate
+    trace = Trace(name) if rate > 0 and random.random() < rate else None
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(token):
+    """Detach the trace started with start_trace from the current context."""
+    _current_trace.reset(token)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def span(stage):
+    """Time a block and record it on the current trace (no-op when the request is not sampled)."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(stage, (time.perf_counter() - start) * 1000)
+
+
+def log_trace(trace, **fields):
+    """Emit one structured (JSON) log line for a finished trace."""
+    record = trace.as_dict()
+    record.update(fields)
+    logger.info(json.dumps(record))
@@ -0,0 +1,162 @@
+"""
+Two-level cache for label translations.
+
+Translations are kept in a memory-capped LRU in front of a SQLite table, so
+they survive restarts and are shared by every Hypercorn worker on the host.
+Entries older than TRANSLATION_CACHE_TTL count as stale: they are refreshed
+when the translator is reachable and served as-is when it is not.
+"""
+import os
+import sqlite3
+import threading
+import time
+from decouple import config
+from utils.cache import LRUCache
+
+# SQLite file backing the cache (empty string keeps translations in memory only)
+TRANSLATION_CACHE_PATH = config('TRANSLATION_CACHE_PATH', default='translation_cache.sqlite3')
+TRANSLATION_CACHE_SIZE = config('TRANSLATION_CACHE_SIZE', default=20000, cast=int)
+TRANSLATION_CACHE_MAX_BYTES = config('TRANSLATION_CACHE_MAX_BYTES', default=8 * 1024 * 1024, cast=int)
+# Age (seconds) after which a translation is refreshed; stale entries are still a fallback
+TRANSLATION_CACHE_TTL = config('TRANSLATION_CACHE_TTL', default=30 * 24 * 3600, cast=int)
+# Most recently used entries loaded into memory at startup
+TRANSLATION_CACHE_WARM = config('TRANSLATION_CACHE_WARM', default=5000, cast=int)
+
+
+def _entry_size(entry):
+    # entry is (translated_text, fetched_at); rough footprint of the str plus tuple overhead
+    return len(entry[0].encode('utf-8')) + 120
+
+
+class TranslationCache:
+    """Memory LRU backed by an on-disk SQLite table keyed by (text, language)."""
+
+    def __init__(self, path=TRANSLATION_CACHE_PATH, max_entries=TRANSLATION_CACHE_SIZE,
+                 max_bytes=TRANSLATION_CACHE_MAX_BYTES, ttl=TRANSLATION_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.memory = LRUCache(max_entries=max_entries, max_bytes=max_bytes,
+                               sizeof=_entry_size, name="translation")
+        self._db = None
+        self._db_lock = threading.Lock()
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self.stale_served = 0
+        self.disk_errors = 0
+
+    def _connection(self):
+        """Open the SQLite store on first use (None when persistence is disabled)."""
+        if not self.path:
+            return None
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")  # Readers in other workers don't block writers
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                " text TEXT NOT NULL, lang TEXT NOT NULL, translated TEXT NOT NULL,"
+                " fetched_at REAL NOT NULL, PRIMARY KEY (text, lang))"
+            )
+            db.commit()
+            self._db = db
+        return self._db
+
+    def is_fresh(self, entry):
+        return time.time() - entry[1] < self.ttl
+
+    def peek(self, text, lang):
+        """Memory-only lookup. Returns (translated, fetched_at) or None; never touches disk."""
+        return self.memory.get((text, lang))
+
+    def load(self, text, lang):
+        """Disk lookup for a memory miss; a hit is promoted into memory. Blocking."""
+        try:
+            with self._db_lock:
+                db = self._connection()
+                row = db.execute(
+                    "SELECT translated, fetched_at FROM translations WHERE text = ? AND lang = ?",
+                    (text, lang),
+                ).fetchone() if db else None
+        except sqlite3.Error as e:
+            self.disk_errors += 1
+            print(f"[WARN] Translation cache read failed: {e}")
+            row = None
+        if row is None:
+            self.disk_misses += 1
+            return None
+        self.disk_hits += 1
+        entry = (row[0], row[1])
+        self.memory.set((text, lang), entry)
+        return entry
+
+    def store(self, text, lang, translated):
+        """Cache a fresh translation in memory and on disk. Blocking."""
+        self.store_many(lang, {text: translated})
+
+    def store_many(self, lang, translations):
+        """Cache {text: translated} for one language, written to disk in a single transaction. Blocking."""
+        fetched_at = time.time()
+        for text, translated in translations.items():
+            self.memory.set((text, lang), (translated, fetched_at))
+        try:
+            with self._db_lock:
+                db = self._connection()
+                if db:
+                    db.executemany(
+                        "INSERT OR REPLACE INTO translations (text, lang, translated, fetched_at) VALUES (?, ?, ?, ?)",
+                        [(text, lang, translated, fetched_at) for text, translated in translations.items()],
+                    )
+                    db.commit()
+        except sqlite3.Error as e:
+            self.disk_errors += 1
+            print(f"[WARN] Translation cache write failed: {e}")
+
+    def record_stale(self):
+        """Count a stale entry served because the translator failed."""
+        self.stale_served += 1
+
+    def warm(self, limit=TRANSLATION_CACHE_WARM):
+        """Load the most recently fetched translations from disk into memory. Returns the count."""
+        try:
+            with self._db_lock:
+                db = self._connection()
+                rows = db.execute(
+                    "SELECT text, lang, translated, fetched_at FROM translations ORDER BY fetched_at DESC LIMIT ?",
+                    (limit,),
+                ).fetchall() if db else []
+        except sqlite3.Error as e:
+            self.disk_errors += 1
+            print(f"[WARN] Translation cache warmup failed: {e}")
+            return 0
+        # Insert oldest first so the newest end up most recently used
+        for text, lang, translated, fetched_at in reversed(rows):
+            self.memory.set((text, lang), (translated, fetched_at))
+        if rows:
+            print(f"Translation cache warmed with {len(rows)} entries from {self.path}")
+        return len(rows)
+
+    def close(self):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self):
+        stats = self.memory.stats()
+        disk_lookups = self.disk_hits + self.disk_misses
+        stats.update({
+            "path": self.path or None,
+            "disk_hits": self.disk_hits,
+            "disk_misses": self.disk_misses,
+            "disk_hit_rate": round(self.disk_hits / disk_lookups, 4) if disk_lookups else 0.0,
+            "disk_errors": self.disk_errors,
+            "stale_served": self.stale_served,
+        })
+        return stats
+
+
+# Create global cache instance
+translation_cache = TranslationCache()
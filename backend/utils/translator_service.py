@@ -0,0 +1,223 @@
+"""
+Shared googletrans front end.
+
+Every translation in the app goes through one TranslatorService, which
+round-robins over a small pool of googletrans clients and adds:
+- a token-bucket rate limit, so bursts don't get us throttled by Google,
+- a deadline per call (TRANSLATOR_TIMEOUT),
+- a circuit breaker: after TRANSLATOR_BREAKER_THRESHOLD consecutive failures
+  calls fail immediately with TranslatorUnavailable for
+  TRANSLATOR_BREAKER_COOLDOWN seconds, so callers fall back to the English
+  text instead of waiting on a degraded upstream,
+- optional hedging: if a call is still pending after TRANSLATOR_HEDGE_DELAY
+  seconds, a second one is sent on another client and the first answer wins.
+"""
+import asyncio
+import itertools
+import threading
+import time
+from decouple import config
+from googletrans import Translator
+
+TRANSLATOR_POOL_SIZE = config('TRANSLATOR_POOL_SIZE', default=4, cast=int)
+# Sustained calls per second and burst size of the token bucket
+TRANSLATOR_RATE = config('TRANSLATOR_RATE', default=10.0, cast=float)
+TRANSLATOR_BURST = config('TRANSLATOR_BURST', default=20, cast=int)
+TRANSLATOR_TIMEOUT = config('TRANSLATOR_TIMEOUT', default=4.0, cast=float)
+TRANSLATOR_BREAKER_THRESHOLD = config('TRANSLATOR_BREAKER_THRESHOLD', default=5, cast=int)
+TRANSLATOR_BREAKER_COOLDOWN = config('TRANSLATOR_BREAKER_COOLDOWN', default=30.0, cast=float)
+# Seconds before a hedged second request is sent (0 disables hedging)
+TRANSLATOR_HEDGE_DELAY = config('TRANSLATOR_HEDGE_DELAY', default=0.0, cast=float)
+
+
+class TranslatorUnavailable(Exception):
+    """Raised without calling upstream: breaker open, rate limited past the deadline, or timed out."""
+
+
+class TokenBucket:
+    """Token bucket shared across threads and event loops (waiting uses asyncio.sleep)."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Take a token, possibly going into debt. Returns how long to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def _refund(self):
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + 1)
+
+    def try_acquire(self):
+        """Take a token only if one is available right now."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    async def acquire(self, deadline):
+        """Wait for a token; raise TranslatorUnavailable if it would not arrive before deadline."""
+        wait = self._reserve()
+        if wait <= 0:
+            return
+        if time.monotonic() + wait > deadline:
+            self._refund()
+            raise TranslatorUnavailable("Translation rate limit exceeded")
+        await asyncio.sleep(wait)
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open (fail fast) -> half-open (one trial call)."""
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = "half_open"  # Let one trial call through
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def abort_trial(self):
+        """The half-open trial call never reached upstream; allow another trial."""
+        with self._lock:
+            if self.state == "half_open":
+                self.state = "open"
+                self.opened_at = time.monotonic() - self.cooldown
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.threshold:
+                if self.state != "open":
+                    self.times_opened += 1
+                    print(f"[WARN] Translator circuit opened after {self.failures} failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+class TranslatorService:
+    """Pooled, rate limited, deadline-bound googletrans client. Drop-in for Translator.translate."""
+
+    def __init__(self, pool_size=TRANSLATOR_POOL_SIZE, rate=TRANSLATOR_RATE, burst=TRANSLATOR_BURST,
+                 timeout=TRANSLATOR_TIMEOUT, breaker_threshold=TRANSLATOR_BREAKER_THRESHOLD,
+                 breaker_cooldown=TRANSLATOR_BREAKER_COOLDOWN, hedge_delay=TRANSLATOR_HEDGE_DELAY,
+                 client_factory=Translator):
+        self.clients = [client_factory() for _ in range(max(1, pool_size))]
+        self._next_client = itertools.cycle(range(len(self.clients)))
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+        self.timeout = timeout
+        self.hedge_delay = hedge_delay
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def _client(self):
+        return self.clients[next(self._next_client)]
+
+    async def translate(self, text, dest='en', src='auto', timeout=None):
+        """
+        Translate text, returning the googletrans result (use `.text`).
+        Raises TranslatorUnavailable when failing fast, or the upstream error.
+        """
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise TranslatorUnavailable("Translator circuit is open")
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        try:
+            await self.bucket.acquire(deadline)
+        except TranslatorUnavailable:
+            self.rejected += 1
+            self.breaker.abort_trial()
+            raise
+        self.calls += 1
+        try:
+            remaining = max(0.0, deadline - time.monotonic())
+            if self.hedge_delay > 0 and len(self.clients) > 1 and self.hedge_delay < remaining:
+                result = await asyncio.wait_for(self._hedged_call(text, dest, src), remaining)
+            else:
+                result = await asyncio.wait_for(self._client().translate(text, dest=dest, src=src), remaining)
+        except asyncio.CancelledError:
+            self.breaker.abort_trial()  # Caller went away; says nothing about upstream health
+            raise
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self.breaker.record_failure()
+            raise TranslatorUnavailable(f"Translation timed out after {self.timeout if timeout is None else timeout}s")
+        except Exception:
+            self.failures += 1
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return result
+
+    async def _hedged_call(self, text, dest, src):
+        """Send one request, and a second one on another client if the first is slow; first success wins."""
+        primary = asyncio.ensure_future(self._client().translate(text, dest=dest, src=src))
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay)
+            if not done and self.bucket.try_acquire():
+                self.hedged += 1
+                tasks.add(asyncio.ensure_future(self._client().translate(text, dest=dest, src=src)))
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self):
+        return {
+            "pool_size": len(self.clients),
+            "breaker_state": self.breaker.state,
+            "breaker_opened": self.breaker.times_opened,
+            "calls": self.calls,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+        }
+
+
+# Create global service instance
+translator_service = TranslatorService()